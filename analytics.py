@@ -0,0 +1,360 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+from instrumentation import count, instrumented
+from progress_store import (
+    LEGACY_GUEST_KEY,
+    REDIS_PREFIX,
+    REDIS_URL,
+    connect_sqlite,
+    get_progress_store,
+    is_profile_id,
+    profile_id,
+    redis_client,
+    run_schema,
+)
+from stats import week_start
+
+
+ANALYTICS_ENABLED = os.getenv("TAROT_ANALYTICS", "true").lower() in ("1", "true", "yes")
+# Where the rollups live: "sqlite" (this node's disk) or "redis" (shared by every replica).
+ANALYTICS_STORE = os.getenv("TAROT_ANALYTICS_STORE", "sqlite").lower()
+ANALYTICS_DB = Path(os.getenv("TAROT_ANALYTICS_DB", "data/analytics.db"))
+DIMENSIONS = ("context", "theme", "goal")
+METRICS = ("sessions", "energy_total", "energy_count")
+
+logger = logging.getLogger(__name__)
+
+
+def rollup_key(entry):
+    return (entry["date"], entry.get("context") or "General", entry["dominant_theme"], entry["goal"])
+
+
+def rollup_deltas(entries):
+    # Fold a batch in memory first so each touched row is written once:
+    # {(grain, period, context, theme, goal): [sessions, energy_total, energy_count]}.
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for entry in entries:
+        day, context, theme, goal = rollup_key(entry)
+        energy = entry.get("energy")
+        for grain, period in (("daily", day), ("weekly", week_start(day))):
+            delta = deltas[grain, period, context, theme, goal]
+            delta[0] += 1
+            if energy is not None:
+                delta[1] += int(energy)
+                delta[2] += 1
+    return deltas
+
+
+class RollupQueries:
+    """The queries behind the Team Analytics view.
+
+    Stores provide record_sessions(), clear() and _rows(grain, start, end, group,
+    aggregates), which sums the `aggregates` metrics of the rollup rows for
+    [start, end], grouped by the `group` columns.
+    """
+
+    @instrumented("analytics.record_session")
+    def record_session(self, entry):
+        self.record_sessions([entry])
+
+    def recent_weeks(self, weeks, today=None):
+        last = date.fromisoformat(week_start(today or date.today()))
+        return [(last - timedelta(weeks=offset)).isoformat() for offset in range(weeks - 1, -1, -1)]
+
+    @instrumented("analytics.query")
+    def weekly_distribution(self, dimension, weeks=8, today=None):
+        """{week: {value: sessions}} for the last `weeks` weeks, oldest first; dimension
+        is one of context, theme or goal."""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension!r}; choose from {', '.join(DIMENSIONS)}")
+        periods = self.recent_weeks(weeks, today)
+        result = {period: {} for period in periods}
+        for period, value, sessions in self._rows("weekly", periods[0], periods[-1], ("period", dimension)):
+            result[period][value] = sessions
+        return result
+
+    @instrumented("analytics.query")
+    def daily_sessions(self, days=28, today=None):
+        """{day: sessions} for the last `days` days, oldest first."""
+        last = today or date.today()
+        periods = [(last - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+        result = dict.fromkeys(periods, 0)
+        for period, sessions in self._rows("daily", periods[0], periods[-1], ("period",)):
+            result[period] = sessions
+        return result
+
+    @instrumented("analytics.query")
+    def energy_by(self, dimension="goal", weeks=8, today=None):
+        """{value: (average energy, sessions)} over the last `weeks` weeks."""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension!r}; choose from {', '.join(DIMENSIONS)}")
+        periods = self.recent_weeks(weeks, today)
+        rows = self._rows("weekly", periods[0], periods[-1], (dimension,), ("energy_total", "energy_count", "sessions"))
+        return {
+            value: (round(energy_total / energy_count, 2) if energy_count else None, sessions)
+            for value, energy_total, energy_count, sessions in rows
+        }
+
+    @instrumented("analytics.query")
+    def summary(self, weeks=8, today=None):
+        periods = self.recent_weeks(weeks, today)
+        sessions, energy_total, energy_count = self._rows("weekly", periods[0], periods[-1], aggregates=METRICS)[0]
+        return {
+            "from": periods[0],
+            "weeks": weeks,
+            "sessions": sessions or 0,
+            "average_energy": round(energy_total / energy_count, 2) if energy_count else None,
+            "by_context": self._totals("context", periods),
+            "by_theme": self._totals("theme", periods),
+        }
+
+    def _totals(self, dimension, periods):
+        rows = self._rows("weekly", periods[0], periods[-1], (dimension,))
+        return dict(sorted(rows, key=lambda row: -row[1]))
+
+
+class AnalyticsStore(RollupQueries):
+    """Org-wide session counts, pre-aggregated per day and per week.
+
+    Each saved session bumps one counter row in each table, so queries read a
+    number of rows bounded by contexts x themes x goals per period, however many
+    sessions or profiles there are. Only aggregates are kept: no names, no
+    challenge text.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            period TEXT NOT NULL,
+            context TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            goal TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            energy_total INTEGER NOT NULL DEFAULT 0,
+            energy_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, context, theme, goal)
+        );
+        CREATE TABLE IF NOT EXISTS weekly_rollups (
+            period TEXT NOT NULL,
+            context TEXT NOT NULL,
+            theme TEXT NOT NULL,
+            goal TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            energy_total INTEGER NOT NULL DEFAULT 0,
+            energy_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, context, theme, goal)
+        );
+    """
+
+    def __init__(self, path=ANALYTICS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self.transaction() as conn:
+            run_schema(conn, self.SCHEMA)
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def clear(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM daily_rollups")
+            conn.execute("DELETE FROM weekly_rollups")
+
+    @instrumented("analytics.record_sessions")
+    def record_sessions(self, entries):
+        deltas = rollup_deltas(entries)
+        count("disk_writes")
+        with self.transaction() as conn:
+            for (grain, period, context, theme, goal), (sessions, energy_total, energy_count) in deltas.items():
+                conn.execute(
+                    f"INSERT INTO {grain}_rollups (period, context, theme, goal, sessions, energy_total, energy_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(period, context, theme, goal) DO UPDATE SET "
+                    "sessions = sessions + excluded.sessions, "
+                    "energy_total = energy_total + excluded.energy_total, "
+                    "energy_count = energy_count + excluded.energy_count",
+                    (period, context, theme, goal, sessions, energy_total, energy_count),
+                )
+
+    def _rows(self, grain, start, end, group=(), aggregates=("sessions",)):
+        count("disk_reads")
+        select = ", ".join(group + tuple(f"SUM({metric})" for metric in aggregates))
+        group_by = f" GROUP BY {', '.join(group)}" if group else ""
+        return self.connect().execute(
+            f"SELECT {select} FROM {grain}_rollups WHERE period >= ? AND period <= ?{group_by}",
+            (start, end),
+        ).fetchall()
+
+
+class RedisAnalyticsStore(RollupQueries):
+    """The same rollups in Redis, so every replica counts every session.
+
+    One hash per grain and period; each field is a metric and the row's
+    (context, theme, goal), bumped with HINCRBY.
+    """
+
+    def __init__(self, url=REDIS_URL, prefix=REDIS_PREFIX):
+        self.client = redis_client(url)
+        self.prefix = prefix
+
+    def key(self, grain, period):
+        return f"{self.prefix}:analytics:{grain}:{period}"
+
+    @property
+    def index_key(self):
+        # Every rollup hash written, so clear() needs no key scan.
+        return f"{self.prefix}:analytics:periods"
+
+    def clear(self):
+        keys = self.client.smembers(self.index_key)
+        self.client.delete(self.index_key, *keys)
+
+    @instrumented("analytics.record_sessions")
+    def record_sessions(self, entries):
+        deltas = rollup_deltas(entries)
+        if not deltas:
+            return
+        pipe = self.client.pipeline()
+        for (grain, period, *row), amounts in deltas.items():
+            field = json.dumps(row)
+            for metric, amount in zip(METRICS, amounts):
+                if amount:
+                    pipe.hincrby(self.key(grain, period), f"{metric}:{field}", amount)
+        pipe.sadd(self.index_key, *{self.key(grain, period) for grain, period, *_ in deltas})
+        count("disk_writes")
+        pipe.execute()
+
+    def _rows(self, grain, start, end, group=(), aggregates=("sessions",)):
+        step = timedelta(days=7 if grain == "weekly" else 1)
+        periods, day = [], date.fromisoformat(start)
+        while day <= date.fromisoformat(end):
+            periods.append(day.isoformat())
+            day += step
+        pipe = self.client.pipeline(transaction=False)
+        for period in periods:
+            pipe.hgetall(self.key(grain, period))
+        count("disk_reads")
+        totals = defaultdict(lambda: [0] * len(aggregates))
+        for period, fields in zip(periods, pipe.execute()):
+            for field, amount in fields.items():
+                metric, row = field.split(":", 1)
+                if metric in aggregates:
+                    columns = dict(zip(DIMENSIONS, json.loads(row)), period=period)
+                    totals[tuple(columns[name] for name in group)][aggregates.index(metric)] += int(amount)
+        if not group:
+            return [tuple(totals[()])]
+        return [key + tuple(values) for key, values in totals.items()]
+
+
+ANALYTICS_BACKENDS = {
+    "sqlite": AnalyticsStore,
+    "redis": RedisAnalyticsStore,
+}
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics():
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                if ANALYTICS_STORE not in ANALYTICS_BACKENDS:
+                    raise ValueError(
+                        f"Unknown TAROT_ANALYTICS_STORE '{ANALYTICS_STORE}'. Choose from: {', '.join(ANALYTICS_BACKENDS)}"
+                    )
+                _analytics = ANALYTICS_BACKENDS[ANALYTICS_STORE]()
+    return _analytics
+
+
+def store_errors():
+    # What the configured rollup store raises when it can't be reached or written.
+    if ANALYTICS_STORE == "redis":
+        import redis
+
+        return (redis.RedisError,)
+    return (sqlite3.Error,)
+
+
+def record_session(entry):
+    # Analytics must never cost a user their save, so failures are only logged.
+    if not ANALYTICS_ENABLED:
+        return
+    try:
+        get_analytics().record_session(entry)
+    except store_errors() as exc:
+        logger.warning("Could not update analytics rollups: %s", exc)
+
+
+def rebuild(store, history, chunk_size=1000):
+    """Replace the rollups with counts recomputed from the session history.
+
+    Returns the number of sessions counted. Sessions saved while this runs may be
+    counted twice or not at all, so run it when the app is quiet.
+    """
+    keys = history.profile_keys()
+    ids = set(keys)
+    store.clear()
+    batch, total = [], 0
+    for key in keys:
+        # A legacy name key already copied to its profile id holds the same sessions.
+        if key != LEGACY_GUEST_KEY and not is_profile_id(key) and profile_id(key) in ids:
+            continue
+        batch += history.sessions(key)
+        if len(batch) >= chunk_size:
+            store.record_sessions(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        store.record_sessions(batch)
+        total += len(batch)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print org-wide session trends from the analytics rollups.")
+    parser.add_argument("--db", type=Path, default=ANALYTICS_DB, help="rollup database for the sqlite store")
+    parser.add_argument("--weeks", type=int, default=8)
+    parser.add_argument(
+        "--rebuild", action="store_true", help="first recompute the rollups from the progress store's session history"
+    )
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.db) if ANALYTICS_STORE == "sqlite" else get_analytics()
+    if args.rebuild:
+        sessions = rebuild(store, get_progress_store().history)
+        print(f"Rebuilt the rollups from {sessions} sessions.", file=sys.stderr)
+    report = store.summary(args.weeks)
+    report["themes_per_week"] = store.weekly_distribution("theme", args.weeks)
+    report["contexts_per_week"] = store.weekly_distribution("context", args.weeks)
+    report["energy_by_goal"] = {goal: average for goal, (average, _) in store.energy_by("goal", args.weeks).items()}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
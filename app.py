@@ -1,100 +1,65 @@
-import copy
-import json
 import os
 import random
-import time
-from datetime import date, timedelta
-from pathlib import Path
+from datetime import date
 
-import openai
 import streamlit as st
-from dotenv import load_dotenv
 
+import bootstrap  # noqa: F401  # isort: skip  (loads .env before the modules below read their settings)
 
-st.set_page_config(
-    page_title="Pasona Connect Tarot App Demo",
-    page_icon="🔮",
-    layout="centered",
+import analytics
+from coaching import (
+    COACH_POLL_SECONDS,
+    PREFETCH_ENABLED,
+    coaching_available,
+    fallback_coaching,
+    get_coaching_cache,
+    get_coaching_pool,
 )
+from deck import get_pack, shuffled_order
+from instrumentation import (
+    PROFILING_ENABLED,
+    finish_rerun,
+    instrumented,
+    recent_reruns,
+    start_rerun,
+    timed,
+)
+from journey_store import (
+    dump_journey,
+    get_journey_store,
+    new_session_id,
+    restore_journey,
+    valid_session_id,
+)
+from progress_store import (
+    ProgressStoreError,
+    adopt_legacy_profile,
+    anonymous_profile_id,
+    get_progress_store,
+    new_profile,
+    profile_id,
+)
+from reading import DEFAULT_SPREAD, build_reading, get_spread, spreads_for_deck
+from stats import sessions_in_last_days
+from templates import share_text, wrap_up_headline
+
+
+start_rerun()
+
+with timed("page_setup"):
+    st.set_page_config(
+        page_title="Pasona Connect Tarot App Demo",
+        page_icon="🔮",
+        layout="centered",
+    )
+
+# Card reveals are animated in the browser; this only sets the animation length.
+REVEAL_ANIMATION_MS = int(os.getenv("REVEAL_ANIMATION_MS", "800"))
+DRAW_GRID_COLUMNS = 5
+# Decks bigger than this get a position picker instead of one button per card.
+DRAW_GRID_LIMIT = int(os.getenv("TAROT_DRAW_GRID_LIMIT", "60"))
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-
-INITIAL_DECK = [
-    {
-        "title": "The Innovator",
-        "emoji": "💡",
-        "meaning": "A brilliant new idea will energize your work. Trust your sudden insights.",
-        "reversed_meaning": "You're experiencing creative block. Step away and seek new inspiration.",
-        "theme": "creativity",
-    },
-    {
-        "title": "The Collaborator",
-        "emoji": "🤝",
-        "meaning": "Your greatest success this week will come from teamwork. Reach out and connect.",
-        "reversed_meaning": "Teamwork is faltering. Address miscommunication or try working solo for a bit.",
-        "theme": "relationships",
-    },
-    {
-        "title": "The Focus Master",
-        "emoji": "🎯",
-        "meaning": "Eliminate distractions. Deep, focused work on a single task will yield great results.",
-        "reversed_meaning": "Scattered attention is holding you back. Reassess your priorities.",
-        "theme": "focus",
-    },
-    {
-        "title": "The Communicator",
-        "emoji": "📣",
-        "meaning": "Speak up. Your voice needs to be heard in an important meeting or discussion.",
-        "reversed_meaning": "Misunderstandings may arise. Listen carefully and clarify your message.",
-        "theme": "communication",
-    },
-    {
-        "title": "The Restful Achiever",
-        "emoji": "🧘",
-        "meaning": "Don't confuse activity with progress. Take a break; your best work will follow.",
-        "reversed_meaning": "Restlessness or burnout is near. Prioritize self-care and boundaries.",
-        "theme": "wellbeing",
-    },
-    {
-        "title": "The Bold Leader",
-        "emoji": "🦁",
-        "meaning": "An opportunity to lead or take ownership of a project will present itself. Seize it.",
-        "reversed_meaning": "Overconfidence or reluctance to lead may cause setbacks. Reflect before acting.",
-        "theme": "leadership",
-    },
-    {
-        "title": "The Student",
-        "emoji": "📚",
-        "meaning": "A skill you need to learn is holding you back. Dedicate time to learning it.",
-        "reversed_meaning": "Avoiding growth or ignoring feedback will stall your progress.",
-        "theme": "growth",
-    },
-    {
-        "title": "The Finisher",
-        "emoji": "🏁",
-        "meaning": "Stop starting and start finishing. Push that lingering project across the finish line.",
-        "reversed_meaning": "Procrastination or perfectionism is blocking completion. Let go and finish.",
-        "theme": "execution",
-    },
-    {
-        "title": "The Networker",
-        "emoji": "🌐",
-        "meaning": "The solution to your problem lies with someone you haven't met yet. Expand your network.",
-        "reversed_meaning": "Networking efforts may feel forced or unproductive. Focus on genuine connections.",
-        "theme": "opportunity",
-    },
-    {
-        "title": "The Organizer",
-        "emoji": "🧹",
-        "meaning": "Clarity comes from order. Tidy your workspace, organize your files, and plan your week.",
-        "reversed_meaning": "Disorganization is causing confusion. Take time to restore order.",
-        "theme": "structure",
-    },
-]
 
-SPREAD_LABELS = ["Past Influence", "Present Focus", "Future Potential"]
 JOURNEY_STEPS = [
     "1. Check-in",
     "2. Draw",
@@ -102,62 +67,15 @@ JOURNEY_STEPS = [
     "4. Action Plan",
     "5. Wrap-up",
 ]
-DATA_DIR = Path("data")
-PROGRESS_FILE = DATA_DIR / "user_progress.json"
-CAREER_CONTEXTS = {
-    "Project Momentum": {
-        "intro": "You want traction and visible progress.",
-        "focus_prompt": "What one deliverable would make this week feel real?",
-        "reflection_questions": [
-            "What is the smallest shippable next step?",
-            "What distraction needs to be cut this week?",
-        ],
-        "action_hint": "Ship progress that another person can see.",
-    },
-    "Team Friction": {
-        "intro": "You are trying to navigate tension, alignment, or trust.",
-        "focus_prompt": "What conversation have you been avoiding?",
-        "reflection_questions": [
-            "Where do you need more clarity before reacting?",
-            "What would a calm, direct conversation sound like?",
-        ],
-        "action_hint": "Replace assumption with one direct conversation.",
-    },
-    "Promotion Readiness": {
-        "intro": "You want to show leadership, impact, and readiness for more scope.",
-        "focus_prompt": "What evidence of impact can you make more visible?",
-        "reflection_questions": [
-            "Which strength should become more visible this month?",
-            "What leadership behavior can you practice before the title changes?",
-        ],
-        "action_hint": "Document impact and make it easy for others to see.",
-    },
-    "Burnout Reset": {
-        "intro": "You need recovery, boundaries, and a more sustainable pace.",
-        "focus_prompt": "What is draining you faster than it should?",
-        "reflection_questions": [
-            "What boundary would lower your stress immediately?",
-            "What can you pause without real cost?",
-        ],
-        "action_hint": "Protect energy before asking for more output.",
-    },
-    "Career Change": {
-        "intro": "You are weighing a bigger shift in role, team, or direction.",
-        "focus_prompt": "What are you moving toward, not just away from?",
-        "reflection_questions": [
-            "What experiment would reduce uncertainty this month?",
-            "What skill or signal would make the next move easier?",
-        ],
-        "action_hint": "Run a small experiment before making a big leap.",
-    },
-}
 
 
+@instrumented()
 def initialize_app_state():
-    if "deck" not in st.session_state:
-        deck = copy.deepcopy(INITIAL_DECK)
-        random.shuffle(deck)
-        st.session_state.deck = deck
+    pack = get_pack()
+    if len(st.session_state.get("deck_order", ())) != len(pack.cards):
+        # First visit, or the deck pack was edited to a different size since the last shuffle.
+        st.session_state.deck_order = shuffled_order()
+        st.session_state.current_card_index = 0
     if "theme_mode" not in st.session_state:
         st.session_state.theme_mode = "light"
     if "current_card_index" not in st.session_state:
@@ -173,22 +91,75 @@ def initialize_app_state():
             "name": "",
             "energy": 3,
             "challenge": "",
-            "goal": "Build momentum on an important project",
-            "context": "Project Momentum",
+            "goal": pack.goals[0],
+            "context": pack.context_names[0],
+            "spread": DEFAULT_SPREAD,
         }
     if "reading_saved" not in st.session_state:
         st.session_state.reading_saved = False
+    if "coaching_job" not in st.session_state:
+        st.session_state.coaching_job = None
+    if "coaching_prefetch" not in st.session_state:
+        st.session_state.coaching_prefetch = None
+
+
+def browser_session_id():
+    # Kept in the page URL, so a reconnect to any replica finds the same journey
+    # and an anonymous visitor keeps their own profile.
+    sid = st.query_params.get("sid")
+    if not valid_session_id(sid):
+        sid = new_session_id()
+        st.query_params["sid"] = sid
+    return sid
+
+
+def restore_journey_state():
+    journeys = get_journey_store()
+    if journeys is None or st.session_state.get("journey_restored"):
+        return
+    st.session_state.journey_restored = True
+    saved = journeys.load(browser_session_id())
+    if saved:
+        restore_journey(st.session_state, saved, get_pack())
+        st.session_state.journey_saved = saved
+
+
+def persist_journey_state():
+    # Runs at the end of each rerun and only writes when the journey changed.
+    journeys = get_journey_store()
+    if journeys is None:
+        return
+    with timed("journey_save"):
+        text = dump_journey(st.session_state)
+        if text != st.session_state.get("journey_saved"):
+            journeys.save(browser_session_id(), text)
+            st.session_state.journey_saved = text
+
+
+def rotate_session_id():
+    # Anyone holding the old link could reopen the journey, so a fresh start drops it
+    # and hands out a new sid. A guest's profile stays keyed by the id it started with.
+    sid = browser_session_id()
+    if "anonymous_id" not in st.session_state:
+        st.session_state.anonymous_id = sid
+    journeys = get_journey_store()
+    if journeys is not None:
+        journeys.delete(sid)
+    st.query_params["sid"] = new_session_id()
+    st.session_state.pop("journey_saved", None)
 
 
 def reset_journey(reset_deck=False):
+    rotate_session_id()
     if reset_deck:
-        deck = copy.deepcopy(INITIAL_DECK)
-        random.shuffle(deck)
-        st.session_state.deck = deck
+        st.session_state.deck_order = shuffled_order()
     st.session_state.journey_step = 0
     st.session_state.selected_seed_index = None
     st.session_state.guided_reading = None
     st.session_state.reading_saved = False
+    st.session_state.coaching_job = None
+    get_coaching_pool().cancel(st.session_state.coaching_prefetch)
+    st.session_state.coaching_prefetch = None
 
 
 def toggle_theme():
@@ -197,28 +168,21 @@ def toggle_theme():
     )
 
 
-def ensure_progress_store():
-    DATA_DIR.mkdir(exist_ok=True)
-    if not PROGRESS_FILE.exists():
-        PROGRESS_FILE.write_text(json.dumps({"profiles": {}}, indent=2), encoding="utf-8")
-
-
-def load_progress_store():
-    ensure_progress_store()
-    try:
-        return json.loads(PROGRESS_FILE.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return {"profiles": {}}
-
-
-def save_progress_store(store):
-    ensure_progress_store()
-    PROGRESS_FILE.write_text(json.dumps(store, indent=2), encoding="utf-8")
+def carry_over_legacy_profile(name):
+    # Profiles saved before hashed ids live under the lower-cased name; copy one to
+    # its id the first time its owner shows up. Checked once per name per session.
+    checked = st.session_state.setdefault("legacy_checked", set())
+    if name not in checked:
+        checked.add(name)
+        adopt_legacy_profile(get_progress_store(), name)
 
 
 def current_profile_key():
-    name = st.session_state.guided_inputs["name"].strip()
-    return name.lower() if name else "guest"
+    name = st.session_state.guided_inputs["name"]
+    if name.strip():
+        carry_over_legacy_profile(name)
+        return profile_id(name)
+    return anonymous_profile_id(st.session_state.get("anonymous_id") or browser_session_id())
 
 
 def current_profile_label():
@@ -227,80 +191,50 @@ def current_profile_label():
 
 
 def get_profile_snapshot():
-    store = load_progress_store()
-    profiles = store.setdefault("profiles", {})
-    profile = profiles.setdefault(
-        current_profile_key(),
-        {
-            "display_name": current_profile_label(),
-            "total_sessions": 0,
-            "last_session_date": None,
-            "streak": 0,
-            "best_streak": 0,
-            "theme_counts": {},
-            "history": [],
-        },
-    )
+    profile = get_progress_store().get_profile(current_profile_key())
+    if profile is None:
+        profile = new_profile(current_profile_label())
     profile["display_name"] = current_profile_label()
-    return store, profile
-
-
-def update_streak(profile, session_day):
-    previous = profile.get("last_session_date")
-    if previous == session_day:
-        return
-    if previous:
-        previous_date = date.fromisoformat(previous)
-        current_date = date.fromisoformat(session_day)
-        if previous_date == current_date - timedelta(days=1):
-            profile["streak"] += 1
-        else:
-            profile["streak"] = 1
-    else:
-        profile["streak"] = 1
-    profile["best_streak"] = max(profile["best_streak"], profile["streak"])
-    profile["last_session_date"] = session_day
+    return profile
 
 
+@instrumented()
 def save_current_session():
     if st.session_state.reading_saved or not st.session_state.guided_reading:
         return
 
-    store, profile = get_profile_snapshot()
     reading = st.session_state.guided_reading
-    session_day = date.today().isoformat()
     next_move = st.session_state.get("user_next_move", "").strip()
-
-    profile["total_sessions"] += 1
-    update_streak(profile, session_day)
-    theme = reading["dominant_theme"]
-    profile["theme_counts"][theme] = profile["theme_counts"].get(theme, 0) + 1
-    profile["history"].insert(
-        0,
-        {
-            "date": session_day,
-            "goal": st.session_state.guided_inputs["goal"],
-            "context": st.session_state.guided_inputs["context"],
-            "challenge": st.session_state.guided_inputs["challenge"],
-            "dominant_theme": theme,
-            "cards": [
-                {
-                    "title": card["title"],
-                    "is_reversed": card["is_reversed"],
-                    "position_label": card["position_label"],
-                }
-                for card in reading["cards"]
-            ],
-            "next_move": next_move or reading["action_plan"][0],
-        },
-    )
-    profile["history"] = profile["history"][:10]
-    save_progress_store(store)
+    entry = {
+        "id": reading["id"],
+        "date": date.today().isoformat(),
+        "goal": st.session_state.guided_inputs["goal"],
+        "context": st.session_state.guided_inputs["context"],
+        "energy": st.session_state.guided_inputs["energy"],
+        "challenge": st.session_state.guided_inputs["challenge"],
+        "dominant_theme": reading["dominant_theme"],
+        "cards": [
+            {
+                "title": card.title,
+                "is_reversed": card.is_reversed,
+                "position_label": card.position_label,
+            }
+            for card in reading["cards"]
+        ],
+        "next_move": next_move or reading["action_plan"][0],
+    }
+    try:
+        get_progress_store().record_session(current_profile_key(), current_profile_label(), entry)
+    except ProgressStoreError as exc:
+        st.error(f"Could not save your progress: {exc}")
+        return
+    analytics.record_session(entry)
     st.session_state.reading_saved = True
 
 
+@instrumented()
 def render_progress_dashboard():
-    _, profile = get_profile_snapshot()
+    profile = get_profile_snapshot()
     st.subheader("Your Progress", anchor=False)
     metric_cols = st.columns(3)
     metric_cols[0].metric("Sessions", profile["total_sessions"])
@@ -310,81 +244,65 @@ def render_progress_dashboard():
     if profile["theme_counts"]:
         top_theme = max(profile["theme_counts"], key=profile["theme_counts"].get)
         st.caption(f"Most common theme so far: {top_theme.title()}")
+    if profile["total_sessions"]:
+        weekly = profile.get("stats", {})
+        st.caption(
+            f"Sessions in the last 30 days: {sessions_in_last_days(profile)} · "
+            f"Weekly streak: {weekly.get('week_streak', 0)} (best {weekly.get('best_week_streak', 0)}) · "
+            f"Active weeks: {weekly.get('active_weeks', 0)}"
+        )
 
     recent = profile["history"][:3]
     if recent:
         st.write("Recent sessions")
         for item in recent:
-            item_context = item.get("context", "General")
-            st.markdown(
-                f"- {item['date']}: {item_context} / {item['dominant_theme'].title()} while working on {item['goal']}"
-            )
+            st.markdown(format_history_item(item))
+    if profile["total_sessions"] > len(recent) and st.toggle("Show all past sessions", key="show_history"):
+        render_session_history()
 
 
-def make_card_snapshot(card, reversed_state, position_label, card_number):
-    return {
-        "title": card["title"],
-        "emoji": card["emoji"],
-        "meaning": card["meaning"],
-        "reversed_meaning": card["reversed_meaning"],
-        "theme": card["theme"],
-        "is_reversed": reversed_state,
-        "position_label": position_label,
-        "card_number": card_number,
-        "active_meaning": card["reversed_meaning"] if reversed_state else card["meaning"],
-    }
+def format_history_item(item):
+    item_context = item.get("context", "General")
+    return f"- {item['date']}: {item_context} / {item['dominant_theme'].title()} while working on {item['goal']}"
 
 
-def build_guided_reading(seed_index):
-    cards = []
-    for offset, label in enumerate(SPREAD_LABELS):
-        card_index = (seed_index + offset) % len(st.session_state.deck)
-        card = st.session_state.deck[card_index]
-        reversed_state = random.choices([False, True], weights=[2, 1])[0]
-        cards.append(
-            make_card_snapshot(
-                card=card,
-                reversed_state=reversed_state,
-                position_label=label,
-                card_number=card_index + 1,
-            )
-        )
+@instrumented()
+def render_session_history():
+    # Pages are only read while the toggle is on, and only as many as were asked for.
+    col1, col2 = st.columns(2)
+    start = col1.date_input("From", value=None, key="history_from")
+    end = col2.date_input("To", value=None, key="history_to")
+    query = (current_profile_key(), start, end)
+    if st.session_state.get("history_query") != query:
+        st.session_state.history_query = query
+        st.session_state.history_pages = 1
+    store = get_progress_store()
+    cursor = None
+    for _ in range(st.session_state.history_pages):
+        entries, cursor = store.history_page(current_profile_key(), cursor=cursor, start=start, end=end)
+        for item in entries:
+            st.markdown(format_history_item(item))
+        if cursor is None:
+            break
+    if not entries and st.session_state.history_pages == 1:
+        st.caption("No sessions in this date range.")
+    if cursor is not None and st.button("Load more", key="history_more"):
+        st.session_state.history_pages += 1
+        st.rerun()
 
-    inputs = st.session_state.guided_inputs
-    context = CAREER_CONTEXTS[inputs["context"]]
-    themes = [card["theme"] for card in cards]
-    theme_counts = {theme: themes.count(theme) for theme in set(themes)}
-    dominant_theme = max(theme_counts, key=theme_counts.get)
-
-    action_plan = [
-        f"{context['action_hint']} Use {cards[1]['title']} as the lens for your next 48 hours.",
-        f"Use the lesson from {cards[0]['title']} to avoid repeating an old pattern this week.",
-        f"Prepare for {cards[2]['title']} by writing down one visible outcome tied to your goal: {inputs['goal']}.",
-    ]
-
-    narrative = (
-        f"For the context of {inputs['context']}, your session starts with {cards[0]['title']}, which points to the recent pattern shaping your work mindset. "
-        f"{cards[1]['title']} is the center of gravity right now, suggesting the most useful response is to stay focused on what moves your goal forward. "
-        f"{cards[2]['title']} suggests where momentum can build next if you act with consistency instead of urgency."
-    )
 
-    reflection = (
-        f"You rated your energy at {inputs['energy']}/5 and named this challenge: '{inputs['challenge'] or 'No challenge entered'}'. "
-        f"{context['intro']} The spread leans most strongly toward {dominant_theme}, so the strongest session takeaway is to align your next action with that theme."
+def build_guided_reading(seed_index):
+    # A fresh seed per reveal; it is kept on the reading so the draw can be replayed.
+    return build_reading(
+        st.session_state.deck_order,
+        seed_index,
+        st.session_state.guided_inputs,
+        seed=random.getrandbits(64),
+        spread=st.session_state.guided_inputs.get("spread"),
     )
 
-    return {
-        "cards": cards,
-        "context": inputs["context"],
-        "dominant_theme": dominant_theme,
-        "narrative": narrative,
-        "reflection": reflection,
-        "action_plan": action_plan,
-        "reflection_questions": context["reflection_questions"],
-        "focus_prompt": context["focus_prompt"],
-    }
-
 
+@instrumented()
 def render_progress_header():
     current_step = st.session_state.journey_step
     progress = (current_step + 1) / len(JOURNEY_STEPS)
@@ -393,21 +311,43 @@ def render_progress_header():
     st.write(" -> ".join(JOURNEY_STEPS))
 
 
-def render_card(card):
-    suffix = " (Reversed)" if card["is_reversed"] else ""
+def render_card(card, position=0):
+    suffix = " (Reversed)" if card.is_reversed else ""
+    reveal_delay = f"animation-delay: {position * REVEAL_ANIMATION_MS // 3}ms;"
     with st.container(border=True):
         st.markdown(
-            f"<p style='text-align:center; font-size:64px; margin-bottom:0.1em;'>{card['emoji']}</p>",
+            f"<p class='tarot-reveal' style='text-align:center; font-size:64px; margin-bottom:0.1em; {reveal_delay}'>{card.emoji}</p>",
             unsafe_allow_html=True,
         )
         st.markdown(
-            f"<h3 style='text-align:center; margin-bottom:0.2em;'>#{card['card_number']}: {card['title']}{suffix}</h3>",
+            f"<h3 class='tarot-reveal' style='text-align:center; margin-bottom:0.2em; {reveal_delay}'>#{card.card_number}: {card.title}{suffix}</h3>",
             unsafe_allow_html=True,
         )
-        st.caption(card["position_label"])
-        st.info(card["active_meaning"])
+        st.caption(card.position_label)
+        st.info(card.active_meaning)
+
+
+def render_spread(reading):
+    spread = get_spread(reading["spread"])
+    cards = reading["cards"]
+    if spread.grid:
+        rows = max(row for row, _ in spread.grid) + 1
+        placed = {cell: position for position, cell in enumerate(spread.grid)}
+        for row in range(rows):
+            for column, col in enumerate(st.columns(spread.columns)):
+                position = placed.get((row, column))
+                if position is not None:
+                    with col:
+                        render_card(cards[position], position)
+        return
+    for row_start in range(0, len(cards), spread.columns):
+        cols = st.columns(spread.columns)
+        for position, col in zip(range(row_start, min(row_start + spread.columns, len(cards))), cols):
+            with col:
+                render_card(cards[position], position)
 
 
+@instrumented()
 def render_deck_browser():
     st.header("Check Deck of Cards", anchor=False, divider="rainbow")
     st.markdown(
@@ -418,15 +358,16 @@ def render_deck_browser():
         """,
         unsafe_allow_html=True,
     )
-    card = INITIAL_DECK[st.session_state.current_card_index]
+    deck = get_pack().cards
+    card = deck[st.session_state.current_card_index]
     st.markdown(
         f"""
         <div class='tarot-card' style='margin: 0 auto; max-width: 340px; background: linear-gradient(135deg, #fff 70%, #f0f0ff 100%); border-radius: 18px; box-shadow: 0 2px 12px 0 rgba(80,80,120,0.10); min-height: 320px; border: 2px solid #e0e0f0; padding: 0.5em 0.5em 0.7em 0.5em;'>
-            <div class='tarot-emoji' style='font-size: 3.5em; text-align: center; margin-top: 1.1em; margin-bottom: 0.2em;'>{card['emoji']}</div>
-            <div class='tarot-title' style='font-size: 1.25em; font-weight: 600; text-align: center; margin-bottom: 0.2em;'>{card['title']}</div>
-            <div class='tarot-meaning' style='font-size: 0.98em; color: #444; text-align: center; margin: 0.5em 0.7em 0.7em 0.7em;'>{card['meaning']}</div>
-            <div class='tarot-reversed' style='font-size: 0.92em; color: #888; text-align: center; margin: 0.2em 0.7em 0.7em 0.7em;'><b>Reversed:</b> {card['reversed_meaning']}</div>
-            <div style='text-align:center; margin-top:0.5em; color:#888;'>Card {st.session_state.current_card_index + 1} of {len(INITIAL_DECK)}</div>
+            <div class='tarot-emoji' style='font-size: 3.5em; text-align: center; margin-top: 1.1em; margin-bottom: 0.2em;'>{card.emoji}</div>
+            <div class='tarot-title' style='font-size: 1.25em; font-weight: 600; text-align: center; margin-bottom: 0.2em;'>{card.title}</div>
+            <div class='tarot-meaning' style='font-size: 0.98em; color: #444; text-align: center; margin: 0.5em 0.7em 0.7em 0.7em;'>{card.meaning}</div>
+            <div class='tarot-reversed' style='font-size: 0.92em; color: #888; text-align: center; margin: 0.2em 0.7em 0.7em 0.7em;'><b>Reversed:</b> {card.reversed_meaning}</div>
+            <div style='text-align:center; margin-top:0.5em; color:#888;'>Card {st.session_state.current_card_index + 1} of {len(deck)}</div>
         </div>
         """,
         unsafe_allow_html=True,
@@ -441,11 +382,12 @@ def render_deck_browser():
     with col3:
         if (
             st.button("➡️", key="next_card", use_container_width=True)
-            and st.session_state.current_card_index < len(INITIAL_DECK) - 1
+            and st.session_state.current_card_index < len(deck) - 1
         ):
             st.session_state.current_card_index += 1
 
 
+@instrumented()
 def render_check_in():
     st.header("Step 1: Check-in", anchor=False, divider="rainbow")
     inputs = st.session_state.guided_inputs
@@ -459,30 +401,27 @@ def render_check_in():
         max_value=5,
         value=inputs["energy"],
     )
+    pack = get_pack()
     inputs["goal"] = st.selectbox(
         "What do you want help with most?",
-        [
-            "Build momentum on an important project",
-            "Improve communication at work",
-            "Get unstuck and regain focus",
-            "Think through a career change",
-            "Recover from burnout and reset",
-        ],
-        index=[
-            "Build momentum on an important project",
-            "Improve communication at work",
-            "Get unstuck and regain focus",
-            "Think through a career change",
-            "Recover from burnout and reset",
-        ].index(inputs["goal"]),
+        pack.goals,
+        index=pack.goal_index.get(inputs["goal"], 0),
     )
     inputs["context"] = st.selectbox(
         "Which situation fits this session?",
-        list(CAREER_CONTEXTS.keys()),
-        index=list(CAREER_CONTEXTS.keys()).index(inputs["context"]),
+        pack.context_names,
+        index=pack.context_index.get(inputs["context"], 0),
         help="This changes the interpretation tone and the follow-up coaching prompts.",
     )
-    st.caption(CAREER_CONTEXTS[inputs["context"]]["focus_prompt"])
+    st.caption(pack.contexts[inputs["context"]].focus_prompt)
+    spreads = spreads_for_deck(len(pack.cards))
+    spread_names = [spread.name for spread in spreads]
+    inputs["spread"] = st.selectbox(
+        "Spread",
+        spread_names,
+        index=spread_names.index(inputs.get("spread")) if inputs.get("spread") in spread_names else 0,
+        format_func=lambda name: get_spread(name).title,
+    )
     inputs["challenge"] = st.text_area(
         "What feels most challenging right now?",
         value=inputs["challenge"],
@@ -494,120 +433,198 @@ def render_check_in():
         st.rerun()
 
 
+@instrumented()
 def render_draw_step():
     st.header("Step 2: Draw Your Starting Card", anchor=False, divider="rainbow")
+    spread = get_spread(st.session_state.guided_inputs.get("spread"))
+    following = spread.size - 1
+    story = {0: "", 2: " The next two cards build the full story."}
     st.write(
-        "Choose one card to start your session. The next two cards build the full story."
+        "Choose one card to start your session."
+        + story.get(following, f" The next {following} cards build the full story.")
     )
     card_back_design = "🎴"
-    cols_top = st.columns(5)
-    cols_bottom = st.columns(5)
-    for i, col in enumerate(cols_top):
-        with col:
-            if st.button(
-                f"{card_back_design}\n{i + 1}",
-                key=f"guided_card_{i}",
-                use_container_width=True,
-            ):
-                st.session_state.selected_seed_index = i
-    for i, col in enumerate(cols_bottom):
-        with col:
-            if st.button(
-                f"{card_back_design}\n{i + 6}",
-                key=f"guided_card_{i + 5}",
-                use_container_width=True,
-            ):
-                st.session_state.selected_seed_index = i + 5
+    deck_size = len(st.session_state.deck_order)
+    if deck_size > DRAW_GRID_LIMIT:
+        # Hundreds of buttons would dominate the rerun; pick a position instead.
+        position = st.number_input(
+            f"Pick a card position (1-{deck_size})",
+            min_value=1,
+            max_value=deck_size,
+            value=(st.session_state.selected_seed_index or 0) + 1,
+        )
+        if st.button("Draw this card", use_container_width=True):
+            st.session_state.selected_seed_index = int(position) - 1
+    else:
+        for row_start in range(0, deck_size, DRAW_GRID_COLUMNS):
+            cols = st.columns(DRAW_GRID_COLUMNS)
+            for i, col in zip(range(row_start, min(row_start + DRAW_GRID_COLUMNS, deck_size)), cols):
+                with col:
+                    if st.button(
+                        f"{card_back_design}\n{i + 1}",
+                        key=f"guided_card_{i}",
+                        use_container_width=True,
+                    ):
+                        st.session_state.selected_seed_index = i
 
     if st.session_state.selected_seed_index is not None:
         st.success(
             f"Starting card locked in at position #{st.session_state.selected_seed_index + 1}."
         )
         if st.button("Reveal the Session", type="primary", use_container_width=True):
-            time.sleep(0.8)
             st.session_state.guided_reading = build_guided_reading(
                 st.session_state.selected_seed_index
             )
+            if PREFETCH_ENABLED and coaching_available():
+                st.session_state.coaching_prefetch = get_coaching_pool().prefetch(
+                    st.session_state.guided_reading,
+                    st.session_state.guided_inputs,
+                    current_profile_key(),
+                )
             st.session_state.journey_step = 2
             st.rerun()
 
 
+@st.fragment(run_every=COACH_POLL_SECONDS)
+def render_coaching_progress():
+    job = st.session_state.coaching_job
+    if job is None or job.poll() != "pending":
+        st.rerun()
+    st.info(
+        "Generating action coach... You can keep going; the result will wait for you."
+    )
+    if job.partial:
+        st.text(job.partial)
+
+
+@instrumented()
+def render_coaching_panel():
+    job = st.session_state.coaching_job
+    if job is None:
+        return
+    status = job.poll()
+    if status == "pending":
+        render_coaching_progress()
+    elif status == "done" and job.result.get("fallback"):
+        st.warning(
+            f"The AI coach is unavailable right now ({job.result['reason']}), so here is the built-in plan for your spread."
+        )
+        st.text_area("Personalized coaching output", value=job.result["text"], height=320)
+    elif status == "done":
+        result = job.result
+        st.success("AI action coach")
+        st.text_area(
+            "Personalized coaching output",
+            value=result["text"],
+            height=320,
+        )
+        stats = get_coaching_cache().stats()
+        st.caption(
+            f"{'Served from' if result['cached'] else 'Added to'} the coaching cache "
+            f"({stats['hits']} hits / {stats['misses']} misses, "
+            f"~{stats['saved_seconds']:.0f}s and {stats['saved_tokens']} tokens saved). "
+            f"First token after {result['first_token_seconds']:.2f}s, "
+            f"done in {result['total_seconds']:.2f}s."
+        )
+        if PREFETCH_ENABLED:
+            prefetch = get_coaching_pool().stats()["prefetch"]
+            st.caption(
+                f"Prefetch: {prefetch['hits']} of {prefetch['started']} used "
+                f"({prefetch['hit_rate']:.0%}), {prefetch['wasted']} wasted calls."
+            )
+    elif status == "busy":
+        st.warning("The AI coach is busy right now. Please try again in a moment.")
+    elif status == "timeout":
+        st.warning("AI coaching timed out, so here is the built-in plan for your spread.")
+        st.text_area(
+            "Personalized coaching output",
+            value=fallback_coaching(st.session_state.guided_reading),
+            height=320,
+        )
+    else:
+        st.error(f"AI coaching failed: {job.error}")
+
+
+@instrumented()
+def render_team_analytics():
+    st.header("Team Analytics", anchor=False, divider="rainbow")
+    st.caption("Trends across everyone's saved sessions. Only counts are stored, never names or challenges.")
+    weeks = st.slider("Weeks", min_value=2, max_value=26, value=8)
+    try:
+        render_team_trends(weeks)
+    except analytics.store_errors() as exc:
+        st.warning(f"Team analytics are unavailable right now: {exc}")
+
+
+def render_team_trends(weeks):
+    store = analytics.get_analytics()
+    summary = store.summary(weeks)
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Sessions", summary["sessions"])
+    metric_cols[1].metric("Average energy", summary["average_energy"] or "-")
+    metric_cols[2].metric("Top context", next(iter(summary["by_context"]), "-"))
+    if not summary["sessions"]:
+        st.info("No sessions saved in this period yet.")
+        return
+
+    for dimension, title in (("theme", "Themes per week"), ("context", "Contexts per week")):
+        per_week = store.weekly_distribution(dimension, weeks)
+        values = sorted({value for counts in per_week.values() for value in counts})
+        chart = {"week": list(per_week)}
+        chart.update({value: [counts.get(value, 0) for counts in per_week.values()] for value in values})
+        st.subheader(title, anchor=False)
+        st.bar_chart(chart, x="week", y=values)
+
+    st.subheader("Energy by goal", anchor=False)
+    st.dataframe(
+        [
+            {"goal": goal, "average energy": average, "sessions": sessions}
+            for goal, (average, sessions) in sorted(store.energy_by("goal", weeks).items())
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+def render_debug_panel():
+    rows = []
+    for rerun in reversed(recent_reruns()):
+        row = {"at": rerun["at"], "status": rerun["status"], "total ms": rerun["total_ms"]}
+        row.update({f"{name} ms": value for name, value in rerun["sections_ms"].items()})
+        row.update(rerun["counts"])
+        rows.append(row)
+    with st.expander("Rerun profile (debug)"):
+        st.dataframe(rows, use_container_width=True)
+
+
+@instrumented()
 def render_interpret_step():
     reading = st.session_state.guided_reading
     st.header("Step 3: Interpretation", anchor=False, divider="rainbow")
-    cols = st.columns(3)
-    for col, card in zip(cols, reading["cards"]):
-        with col:
-            render_card(card)
+    render_spread(reading)
 
     st.subheader("What the spread is saying", anchor=False)
     st.caption(f"Context: {reading['context']}")
     st.write(reading["narrative"])
     st.write(reading["reflection"])
 
-    if openai.api_key:
+    if coaching_available():
         st.subheader("AI coaching assist", anchor=False)
         st.caption(
             "Generate concrete next steps and a reusable message draft based on this spread."
         )
         if st.button("Generate AI action coach", use_container_width=True):
-            ai_prompt = (
-                "You are a thoughtful career coach. Use the tarot reading only as a reflection lens, "
-                "then turn it into practical output.\n\n"
-                "Return plain text using exactly these sections and labels:\n"
-                "Situation:\n"
-                "Priority:\n"
-                "Next steps:\n"
-                "- ...\n"
-                "- ...\n"
-                "- ...\n"
-                "Message draft:\n"
-                "...\n\n"
-                "Requirements:\n"
-                "- Keep Situation to 2 sentences max.\n"
-                "- Keep Priority to 1 sentence.\n"
-                "- Each next step must be specific, realistic, and doable within 1 week.\n"
-                "- The message draft must be 3-5 sentences and usable for a manager, teammate, or mentor.\n"
-                "- Ground the advice in the user's context, challenge, energy level, and cards.\n"
-                "- Avoid mystical language and avoid repeating the narrative verbatim.\n\n"
-                f"Context: {reading['context']}\n"
-                f"Goal: {st.session_state.guided_inputs['goal']}\n"
-                f"Challenge: {st.session_state.guided_inputs['challenge'] or 'Not provided'}\n"
-                f"Energy: {st.session_state.guided_inputs['energy']}/5\n"
-                f"Dominant theme: {reading['dominant_theme']}\n"
-                f"Cards: {', '.join([card['title'] + (' reversed' if card['is_reversed'] else '') for card in reading['cards']])}\n"
-                f"Narrative: {reading['narrative']}\n"
-                f"Reflection: {reading['reflection']}\n"
-                f"Current action plan ideas: {' | '.join(reading['action_plan'])}\n"
+            st.session_state.coaching_job = get_coaching_pool().submit(
+                reading, st.session_state.guided_inputs
             )
-            with st.spinner("Generating action coach..."):
-                try:
-                    response = openai.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "You convert reflection into practical career coaching.",
-                            },
-                            {"role": "user", "content": ai_prompt},
-                        ],
-                        max_tokens=420,
-                        temperature=0.7,
-                    )
-                    st.success("AI action coach")
-                    st.text_area(
-                        "Personalized coaching output",
-                        value=response.choices[0].message.content.strip(),
-                        height=320,
-                    )
-                except Exception as exc:
-                    st.error(f"AI coaching failed: {exc}")
+        render_coaching_panel()
 
     if st.button("Build My Action Plan", type="primary", use_container_width=True):
         st.session_state.journey_step = 3
         st.rerun()
 
 
+@instrumented()
 def render_action_plan_step():
     reading = st.session_state.guided_reading
     st.header("Step 4: Action Plan", anchor=False, divider="rainbow")
@@ -634,30 +651,24 @@ def render_action_plan_step():
         placeholder="What do you want to remember from this session next week?",
     )
 
+    if st.session_state.coaching_job is not None:
+        with st.expander("AI action coach", expanded=True):
+            render_coaching_panel()
+
     if st.button("Finish Session", type="primary", use_container_width=True):
         st.session_state.journey_step = 4
         st.rerun()
 
 
+@instrumented()
 def render_wrap_up():
     reading = st.session_state.guided_reading
     inputs = st.session_state.guided_inputs
     save_current_session()
     st.header("Step 5: Wrap-up", anchor=False, divider="rainbow")
-    st.success(
-        f"Dominant theme: {reading['dominant_theme'].title()}. Keep your next move small, visible, and tied to your goal."
-    )
-    session_name = inputs["name"].strip() or "Your"
-    share_text = (
-        f"{session_name} guided tarot session\n"
-        f"Context: {reading['context']}\n"
-        f"Goal: {inputs['goal']}\n"
-        f"Challenge: {inputs['challenge'] or 'Not provided'}\n"
-        f"Cards: {', '.join([card['title'] + (' reversed' if card['is_reversed'] else '') for card in reading['cards']])}\n"
-        f"Takeaway: {reading['narrative']}\n"
-        f"Next move: {st.session_state.get('user_next_move', '').strip() or reading['action_plan'][0]}"
-    )
-    st.text_area("Session summary", value=share_text, height=220)
+    st.success(wrap_up_headline(reading))
+    summary = share_text(reading, inputs, st.session_state.get("user_next_move", ""))
+    st.text_area("Session summary", value=summary, height=220)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -670,6 +681,7 @@ def render_wrap_up():
             st.rerun()
 
 
+restore_journey_state()
 initialize_app_state()
 
 st.title("✨ :rainbow[Pasona Connect] Tarot App Demo")
@@ -681,14 +693,13 @@ st.divider()
 
 with st.sidebar:
     st.header("✨ Controls")
-    experience_mode = st.radio(
-        "Choose a mode:",
-        ("Guided Career Session", "Check Deck of Cards"),
-        captions=(
-            "A longer reflective experience with five steps.",
-            "Browse the full deck and meanings.",
-        ),
-    )
+    modes = {
+        "Guided Career Session": "A longer reflective experience with five steps.",
+        "Check Deck of Cards": "Browse the full deck and meanings.",
+    }
+    if analytics.ANALYTICS_ENABLED:
+        modes["Team Analytics"] = "Org-wide themes, contexts and energy over time."
+    experience_mode = st.radio("Choose a mode:", tuple(modes), captions=tuple(modes.values()))
 
     if st.button("Reset Session", use_container_width=True):
         reset_journey(reset_deck=False)
@@ -696,9 +707,10 @@ with st.sidebar:
 
     if st.button("Shuffle Deck", use_container_width=True):
         reset_journey(reset_deck=True)
-        st.success("The deck has been shuffled.")
-        time.sleep(0.6)
+        st.session_state.deck_shuffled = True
         st.rerun()
+    if st.session_state.pop("deck_shuffled", False):
+        st.toast("The deck has been shuffled.", icon="🔀")
 
     if st.button("Toggle Light/Dark Mode", use_container_width=True):
         toggle_theme()
@@ -706,8 +718,13 @@ with st.sidebar:
             f"Theme toggled to {st.session_state.theme_mode.title()}. Streamlit theme changes still depend on Streamlit settings."
         )
 
+    if PROFILING_ENABLED and st.query_params.get("debug") == "1":
+        render_debug_panel()
+
 if experience_mode == "Check Deck of Cards":
     render_deck_browser()
+elif experience_mode == "Team Analytics":
+    render_team_analytics()
 else:
     render_progress_header()
     render_progress_dashboard()
@@ -724,32 +741,42 @@ else:
         render_wrap_up()
 
 st.markdown(
-    """
+    f"""
     <style>
-    .tarot-card {
+    .tarot-card {{
         transition: box-shadow 0.3s, border-color 0.3s, transform 0.25s cubic-bezier(.25,.8,.25,1);
-    }
-    .tarot-card:hover {
+    }}
+    .tarot-card:hover {{
         box-shadow: 0 0 16px 4px #a084ff, 0 2px 12px 0 rgba(80,80,120,0.10);
         border: 2.5px solid #a084ff !important;
         transform: scale(1.06) perspective(600px) rotateY(-2deg) rotateX(2deg);
         z-index: 2;
-    }
-    .tarot-emoji {
+    }}
+    .tarot-emoji {{
         animation: tarot-bounce 1.2s cubic-bezier(.28,.84,.42,1) infinite alternate;
         display: flex;
         justify-content: center;
         align-items: center;
         width: 100%;
         text-align: center;
-    }
-    @keyframes tarot-bounce {
-        0%   { transform: translateY(0); }
-        40%  { transform: translateY(-18px) scale(1.08); }
-        60%  { transform: translateY(-12px) scale(1.04); }
-        100% { transform: translateY(0); }
-    }
+    }}
+    .tarot-reveal {{
+        animation: tarot-flip {REVEAL_ANIMATION_MS}ms cubic-bezier(.25,.8,.25,1) both;
+    }}
+    @keyframes tarot-flip {{
+        0%   {{ opacity: 0; transform: perspective(600px) rotateY(90deg); }}
+        100% {{ opacity: 1; transform: perspective(600px) rotateY(0); }}
+    }}
+    @keyframes tarot-bounce {{
+        0%   {{ transform: translateY(0); }}
+        40%  {{ transform: translateY(-18px) scale(1.08); }}
+        60%  {{ transform: translateY(-12px) scale(1.04); }}
+        100% {{ transform: translateY(0); }}
+    }}
     </style>
     """,
     unsafe_allow_html=True,
 )
+
+persist_journey_state()
+finish_rerun()
@@ -0,0 +1,197 @@
+"""Generate readings (and optionally AI coaching) for a file of check-ins.
+
+    python batch.py checkins.csv readings.jsonl
+    python batch.py checkins.jsonl readings.jsonl --coach --concurrency 4 --per-minute 60 --seed 7
+
+Input rows are CSV or JSONL with name, energy, goal, context and challenge
+(optional: id, spread, seed). Results are appended to the output as one JSON line
+per row as soon as they are ready, so an interrupted run can simply be started
+again: rows already written without an error are skipped.
+"""
+
+import argparse
+import csv
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import openai
+
+import bootstrap  # noqa: F401
+from coaching import COACH_TIMEOUT_SECONDS, coaching_available, generate_coaching
+from deck import get_pack, shuffled_order
+from reading import DEFAULT_SPREAD, build_reading, reading_to_dict
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than `per_minute` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_rows(path):
+    # Yields (row key, row); the key is the row's own id or its 1-based position.
+    with open(path, encoding="utf-8", newline="") as handle:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(handle)
+        else:
+            rows = (json.loads(line) for line in handle if line.strip())
+        for number, row in enumerate(rows, start=1):
+            yield str(row.get("id") or number), row
+
+
+def finished_rows(path):
+    """Row keys already written successfully; also trims a half-written last line."""
+    if not path.exists():
+        return set()
+    data = path.read_bytes()
+    if data and not data.endswith(b"\n"):
+        # The previous run was killed mid-write; drop the partial line so appends stay valid.
+        data = data[: data.rfind(b"\n") + 1]
+        with open(path, "r+b") as handle:
+            handle.truncate(len(data))
+    done = set()
+    for line in data.decode("utf-8").splitlines():
+        record = json.loads(line)
+        if "error" not in record:
+            done.add(record["row"])
+        else:
+            done.discard(record["row"])
+    return done
+
+
+def row_inputs(row, pack):
+    energy = int(row.get("energy") or 3)
+    if not 1 <= energy <= 5:
+        raise ValueError(f"energy must be between 1 and 5, got {energy}")
+    context = (row.get("context") or "").strip() or pack.context_names[0]
+    if context not in pack.contexts:
+        raise ValueError(f"unknown context {context!r}")
+    return {
+        "name": (row.get("name") or "").strip(),
+        "energy": energy,
+        "challenge": (row.get("challenge") or "").strip(),
+        "goal": (row.get("goal") or "").strip() or pack.goals[0],
+        "context": context,
+        "spread": (row.get("spread") or "").strip() or DEFAULT_SPREAD,
+    }
+
+
+def row_seed(key, row, base_seed):
+    if row.get("seed") not in (None, ""):
+        return int(row["seed"])
+    if base_seed is None:
+        return random.getrandbits(64)
+    # Stable per row, so a resumed or reordered run draws the same cards.
+    return random.Random(f"{base_seed}:{key}").getrandbits(64)
+
+
+def coach_with_retries(reading, inputs, limiter, retries, timeout):
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            return generate_coaching(reading, inputs, timeout=timeout)["text"]
+        except RETRYABLE_ERRORS:
+            if attempt == retries:
+                raise
+            time.sleep(min(30.0, 2**attempt) * random.uniform(0.5, 1.5))
+
+
+def process_row(key, row, args, limiter):
+    pack = get_pack()
+    try:
+        inputs = row_inputs(row, pack)
+        seed = row_seed(key, row, args.seed)
+        rng = random.Random(seed)
+        deck_order = shuffled_order(rng)
+        reading = build_reading(deck_order, rng.randrange(len(deck_order)), inputs, seed=seed, spread=inputs["spread"], pack=pack)
+    except (TypeError, ValueError) as exc:
+        return {"row": key, "input": row, "error": f"invalid row: {exc}"}
+    record = {"row": key, "input": inputs, "reading": reading_to_dict(reading)}
+    if args.coach:
+        try:
+            record["coaching"] = coach_with_retries(reading, inputs, limiter, args.retries, args.timeout)
+        except Exception as exc:
+            record["error"] = f"coaching failed: {exc}"
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="CSV or JSONL file of check-ins")
+    parser.add_argument("output", type=Path, help="JSONL file to append results to")
+    parser.add_argument("--coach", action="store_true", help="also generate AI coaching for every row")
+    parser.add_argument("--concurrency", type=int, default=4, help="rows in flight at once")
+    parser.add_argument("--per-minute", type=int, default=60, help="max coaching requests started per minute (0 = no limit)")
+    parser.add_argument("--retries", type=int, default=3, help="retries per row for timeouts, rate limits and 5xx errors")
+    parser.add_argument("--timeout", type=float, default=COACH_TIMEOUT_SECONDS)
+    parser.add_argument("--seed", type=int, default=None, help="base seed; makes every row's draw reproducible")
+    args = parser.parse_args()
+
+    if args.coach and not coaching_available():
+        parser.error("--coach needs OPENAI_API_KEY")
+
+    done = finished_rows(args.output)
+    limiter = RateLimiter(args.per_minute)
+    written = skipped = failed = 0
+    started = time.perf_counter()
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending, written, failed
+            finished, pending = wait(pending, return_when=return_when)
+            for future in finished:
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                written += 1
+                if "error" in record:
+                    failed += 1
+                    print(f"row {record['row']}: {record['error']}", file=sys.stderr)
+
+        for key, row in read_rows(args.input):
+            if key in done:
+                skipped += 1
+                continue
+            done.add(key)
+            pending.add(executor.submit(process_row, key, row, args, limiter))
+            # Only a few rows are held in memory at a time, however big the input is.
+            if len(pending) >= args.concurrency * 2:
+                drain(FIRST_COMPLETED)
+        while pending:
+            drain(FIRST_COMPLETED)
+
+    elapsed = time.perf_counter() - started
+    print(f"{written} rows written ({failed} failed), {skipped} already done, in {elapsed:.1f}s -> {args.output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Show that analytics queries stay flat as the number of saved sessions grows.
+
+Loads synthetic sessions into a scratch rollup database in steps and times the
+queries behind the Team Analytics view after each step, plus the per-save cost.
+
+    python benchmarks/analytics_queries.py --steps 10000 100000 1000000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from analytics import AnalyticsStore  # noqa: E402
+from deck import get_pack  # noqa: E402
+
+
+def synthetic_entries(rng, count, days, pack):
+    themes = sorted({card.theme for card in pack.cards})
+    today = date.today()
+    for _ in range(count):
+        yield {
+            "date": (today - timedelta(days=rng.randrange(days))).isoformat(),
+            "context": rng.choice(pack.context_names),
+            "dominant_theme": rng.choice(themes),
+            "goal": rng.choice(pack.goals),
+            "energy": rng.randint(1, 5),
+        }
+
+
+def time_queries(store, weeks, repeats=20):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        store.summary(weeks)
+        store.weekly_distribution("theme", weeks)
+        store.weekly_distribution("context", weeks)
+        store.energy_by("goal", weeks)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[10000, 100000, 1000000], help="total sessions after each step")
+    parser.add_argument("--days", type=int, default=180, help="spread sessions over this many days")
+    parser.add_argument("--weeks", type=int, default=8, help="dashboard window")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pack = get_pack()
+    with tempfile.TemporaryDirectory() as workdir:
+        store = AnalyticsStore(Path(workdir) / "analytics.db")
+        loaded = 0
+        print(f"{'sessions':>10} {'rollup rows':>12} {'dashboard ms':>13} {'single save ms':>15}")
+        for target in args.steps:
+            batch = []
+            for entry in synthetic_entries(rng, target - loaded, args.days, pack):
+                batch.append(entry)
+                if len(batch) == 5000:
+                    store.record_sessions(batch)
+                    batch = []
+            if batch:
+                store.record_sessions(batch)
+            loaded = target
+            saves = []
+            for entry in synthetic_entries(rng, 50, args.days, pack):
+                started = time.perf_counter()
+                store.record_session(entry)
+                saves.append(time.perf_counter() - started)
+            loaded += 50
+            rows = store.connect().execute("SELECT COUNT(*) FROM weekly_rollups").fetchone()[0]
+            rows += store.connect().execute("SELECT COUNT(*) FROM daily_rollups").fetchone()[0]
+            print(
+                f"{loaded:>10} {rows:>12} {time_queries(store, args.weeks):>13.2f} "
+                f"{statistics.median(saves) * 1000:>15.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare time-to-first-token and total time for streamed vs blocking AI coaching.
+
+Runs against the local fake server, so no API key or network is needed. Both modes
+must produce identical final text.
+
+    python benchmarks/coaching_latency.py --requests 5 --latency 0.4 --token-delay 0.02
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+import coaching  # noqa: E402
+from deck import DrawnCard  # noqa: E402
+from fake_openai_server import start_fake_server  # noqa: E402
+
+SAMPLE_READING = {
+    "context": "Project Momentum",
+    "dominant_theme": "focus",
+    "cards": [
+        DrawnCard(index=7, slot=0, is_reversed=False, position_label="Past Influence"),
+        DrawnCard(index=2, slot=1, is_reversed=True, position_label="Present Focus"),
+        DrawnCard(index=9, slot=2, is_reversed=False, position_label="Future Potential"),
+    ],
+    "narrative": "Sample narrative.",
+    "reflection": "Sample reflection.",
+    "action_plan": ["One", "Two", "Three"],
+}
+SAMPLE_INPUTS = {"goal": "Get unstuck and regain focus", "energy": 2, "challenge": "Too many open tasks"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server, url = start_fake_server(latency=args.latency, token_delay=args.token_delay)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ["OPENAI_API_KEY"] = "test"
+    prompt = coaching.build_coaching_prompt(SAMPLE_READING, SAMPLE_INPUTS)
+
+    blocking, streamed, first_tokens = [], [], []
+    texts = set()
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        text, _ = coaching.request_coaching(prompt)
+        blocking.append(time.perf_counter() - started)
+        texts.add(text)
+
+        started = time.perf_counter()
+        text, _, first_token = coaching.stream_coaching(prompt, lambda partial: None)
+        streamed.append(time.perf_counter() - started)
+        first_tokens.append(first_token)
+        texts.add(text)
+    server.shutdown()
+
+    print(f"blocking : first output {statistics.median(blocking):.3f}s, total {statistics.median(blocking):.3f}s")
+    print(f"streaming: first token  {statistics.median(first_tokens):.3f}s, total {statistics.median(streamed):.3f}s")
+    if len(texts) != 1:
+        print("Streamed and blocking outputs differ!")
+        sys.exit(1)
+    print("Final text identical in both modes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Exercise the coaching client against injected upstream latency and errors.
+
+Runs phases against the local fake server: healthy, flaky (a share of 500/429
+answers), a full outage, then a single probe and recovery, and reports successes, built-in fallbacks,
+retries, circuit-breaker opens and how many TCP connections were opened.
+
+    python benchmarks/coaching_resilience.py --requests 40 --error-rate 0.3
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Short timings so the phases finish quickly; set before coaching reads them.
+os.environ.setdefault("COACH_RETRY_BASE", "0.05")
+os.environ.setdefault("COACH_BREAKER_RESET", "2")
+os.environ.setdefault("COACH_TIMEOUT", "5")
+os.environ.setdefault("COACH_SLOW_SECONDS", "2")
+
+import coaching  # noqa: E402
+from fake_openai_server import start_fake_server  # noqa: E402
+
+SAMPLE_READING = {
+    "context": "Project Momentum",
+    "dominant_theme": "focus",
+    "cards": [],
+    "narrative": "The spread points at focus.",
+    "reflection": "Energy is fine.",
+    "action_plan": ["Ship one visible thing.", "Cut one distraction.", "Write down the outcome."],
+}
+
+
+def run_phase(pool, name, requests, server, handler, **settings):
+    for key, value in settings.items():
+        setattr(handler, key, value)
+    before = dict(server.stats)
+    upstream_before = coaching.upstream_stats()
+    started = time.perf_counter()
+    jobs = []
+    for index in range(requests):
+        # A different challenge per request, so the cache doesn't answer for us.
+        inputs = {"goal": "Bench", "energy": 3, "challenge": f"{name} {index} {time.time()}"}
+        jobs.append((time.perf_counter(), pool.submit(SAMPLE_READING, inputs)))
+    latencies, fallbacks, busy = [], 0, 0
+    for submitted, job in jobs:
+        while job.poll() == "pending":
+            time.sleep(0.01)
+        latencies.append(time.perf_counter() - submitted)
+        if job.status == "busy":
+            busy += 1
+        elif job.status != "done" or job.result.get("fallback"):
+            fallbacks += 1
+    upstream = coaching.upstream_stats()
+    print(
+        f"{name:<10}ok {requests - fallbacks - busy:>3}  fallback {fallbacks:>3}  busy {busy:>3}  "
+        f"upstream calls {server.stats['requests'] - before['requests']:>3}  "
+        f"retries {upstream['retries'] - upstream_before['retries']:>3} "
+        f"(denied {upstream['retries_denied'] - upstream_before['retries_denied']})  "
+        f"breaker {upstream['breaker']} (opened {upstream['breaker_opens'] - upstream_before['breaker_opens']}x)  "
+        f"p50 {statistics.median(latencies) * 1000:.0f} ms  in {time.perf_counter() - started:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="requests per phase")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.3, help="error share in the flaky phase")
+    args = parser.parse_args()
+
+    server, url = start_fake_server(latency=args.latency)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ["OPENAI_API_KEY"] = "test"
+    handler = server.RequestHandlerClass
+    pool = coaching.CoachingPool(workers=8, queue_limit=args.requests)
+
+    run_phase(pool, "healthy", args.requests, server, handler, error_rate=0.0)
+    run_phase(pool, "flaky", args.requests, server, handler, error_rate=args.error_rate)
+    run_phase(pool, "outage", args.requests, server, handler, error_rate=1.0)
+    time.sleep(coaching.COACH_BREAKER_RESET_SECONDS)
+    # The half-open breaker lets exactly one trial request through; it closes on success.
+    run_phase(pool, "probe", 1, server, handler, error_rate=0.0)
+    run_phase(pool, "recovered", args.requests, server, handler, error_rate=0.0)
+    print(f"\n{server.stats['requests']} upstream requests over {server.stats['connections']} TCP connections")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Measure cold-start cost: module import times and the first page render.
+
+Every measurement runs in a fresh interpreter, like a new autoscaled container.
+
+    python benchmarks/cold_start.py --runs 5
+    python benchmarks/cold_start.py --runs 5 --save-baseline benchmarks/cold_start_baseline.json
+    python benchmarks/cold_start.py --runs 5 --compare benchmarks/cold_start_baseline.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ["streamlit", "openai", "numpy", "instrumentation", "progress_store", "deck", "templates", "reading", "coaching"]
+
+IMPORT_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+RENDER_PROBE = """
+import os, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file({app!r}, default_timeout=60).run()
+rendered = time.perf_counter()
+app.run()
+rerun = time.perf_counter()
+if app.exception:
+    raise SystemExit(app.exception[0].message)
+print(imported - started, rendered - imported, rerun - rendered, "openai" in sys.modules)
+"""
+
+
+def probe(code, workdir):
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    results = {"imports_ms": {}, "render_ms": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in MODULES:
+            times = [float(probe(IMPORT_PROBE.format(root=str(ROOT), module=module), workdir)[0]) for _ in range(args.runs)]
+            results["imports_ms"][module] = round(statistics.median(times) * 1000, 1)
+
+        samples = [probe(RENDER_PROBE.format(app=str(ROOT / "app.py")), workdir) for _ in range(args.runs)]
+        for column, name in enumerate(["testing_harness", "first_render", "second_render"]):
+            results["render_ms"][name] = round(statistics.median(float(sample[column]) for sample in samples) * 1000, 1)
+        results["openai_loaded_on_first_page"] = any(sample[3] == "True" for sample in samples)
+
+    print(f"{'import (fresh process)':<28}{'median ms':>10}")
+    for module, value in results["imports_ms"].items():
+        print(f"{module:<28}{value:>10.1f}")
+    print(f"\n{'page':<28}{'median ms':>10}")
+    for name, value in results["render_ms"].items():
+        print(f"{name:<28}{value:>10.1f}")
+    print(f"\nopenai imported by the first page: {results['openai_loaded_on_first_page']}")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = []
+        for name in ("first_render", "second_render"):
+            before, now = baseline["render_ms"][name], results["render_ms"][name]
+            change = (now - before) / before if before else 0.0
+            print(f"{name}: {before:.1f} -> {now:.1f} ms ({change:+.0%})")
+            if change > args.tolerance:
+                regressions.append(name)
+        if regressions:
+            print(f"REGRESSION: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
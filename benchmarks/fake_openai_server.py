@@ -0,0 +1,198 @@
+"""A tiny OpenAI-compatible chat completions server for local benchmarks.
+
+It answers POST /v1/chat/completions with a fixed coaching reply, either as one
+JSON body or as a chunked server-sent-event stream, with configurable delays. It can
+also inject failures: a share of requests answered with 500/429 errors, and a share
+answered very slowly.
+
+    python benchmarks/fake_openai_server.py --port 8765 --latency 0.4 --token-delay 0.02
+    python benchmarks/fake_openai_server.py --port 8765 --error-rate 0.3 --slow-rate 0.1 --slow-latency 10
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test streamlit run app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Situation:\n"
+    "You are juggling several half-finished tasks and reacting instead of prioritizing. "
+    "The spread points to focus as the lever that moves your project forward.\n"
+    "Priority:\n"
+    "Finish one visible deliverable before starting anything new.\n"
+    "Next steps:\n"
+    "- Block 45 minutes tomorrow morning for the project outline.\n"
+    "- List every open task and park the ones that do not serve this week's goal.\n"
+    "- Send the outline to one teammate for feedback by Thursday.\n"
+    "Message draft:\n"
+    "Hi, I want to make sure the project outline lands this week. "
+    "I'm blocking focused time tomorrow to finish a first version. "
+    "Could you give it a quick review on Thursday? "
+    "Your feedback would help me lock the priorities for next week."
+)
+
+
+def split_tokens(text):
+    # Roughly word-sized pieces, keeping whitespace attached like real deltas.
+    tokens = []
+    current = ""
+    for char in text:
+        current += char
+        if char in " \n":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    token_delay = 0.0
+    error_rate = 0.0
+    slow_rate = 0.0
+    slow_latency = 10.0
+    reply = REPLY
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # One handler instance per TCP connection, so this counts connections opened.
+        self.server.stats["connections"] += 1
+
+    def _chunk(self, delta, finish_reason=None):
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_event(self, body):
+        data = body if isinstance(body, str) else json.dumps(body)
+        payload = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        try:
+            self._handle_post()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout or cancelled stream); nothing left to send.
+            pass
+
+    def _handle_post(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        self.server.stats["requests"] += 1
+        roll = random.random()
+        if roll < self.error_rate:
+            self.server.stats["errors"] += 1
+            status, kind = random.choice([(500, "server_error"), (429, "rate_limit_exceeded")])
+            self._send_json(status, {"error": {"message": f"Injected {status}", "type": kind}})
+            return
+        if roll < self.error_rate + self.slow_rate:
+            self.server.stats["slow"] += 1
+            time.sleep(self.slow_latency)
+        time.sleep(self.latency)
+        tokens = split_tokens(self.reply)
+        usage = {"prompt_tokens": 300, "completion_tokens": len(tokens), "total_tokens": 300 + len(tokens)}
+
+        if not request.get("stream"):
+            time.sleep(self.token_delay * len(tokens))
+            self._send_json(
+                200,
+                {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "gpt-4o"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": self.reply},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._send_event(self._chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            time.sleep(self.token_delay)
+            self._send_event(self._chunk({"content": token}))
+        self._send_event(self._chunk({}, finish_reason="stop"))
+        if request.get("stream_options", {}).get("include_usage"):
+            final = self._chunk({})
+            final["choices"] = []
+            final["usage"] = usage
+            self._send_event(final)
+        self._send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_fake_server(port=0, latency=0.0, token_delay=0.0, error_rate=0.0, slow_rate=0.0, slow_latency=10.0):
+    handler = type(
+        "ConfiguredFakeOpenAIHandler",
+        (FakeOpenAIHandler,),
+        {
+            "latency": latency,
+            "token_delay": token_delay,
+            "error_rate": error_rate,
+            "slow_rate": slow_rate,
+            "slow_latency": slow_latency,
+        },
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.stats = {"connections": 0, "requests": 0, "errors": 0, "slow": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.4, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500/429")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=10.0)
+    args = parser.parse_args()
+    server, url = start_fake_server(
+        args.port, args.latency, args.token_delay, args.error_rate, args.slow_rate, args.slow_latency
+    )
+    print(f"Fake OpenAI server listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""A tiny in-memory Redis stand-in for local tests and benchmarks.
+
+It speaks RESP2, or RESP3 for clients that ask for it with HELLO, and implements
+just the commands the shared stores use: strings with expiry, counters, hashes,
+sets, sorted sets, and WATCH/MULTI/EXEC optimistic transactions.
+Several app processes can point at it to act as replicas sharing one store.
+
+    python benchmarks/fake_redis_server.py --port 6390
+    PROGRESS_BACKEND=redis TAROT_JOURNEY_STORE=redis TAROT_REDIS_URL=redis://127.0.0.1:6390/0 streamlit run app.py
+"""
+
+import argparse
+import bisect
+import socketserver
+import threading
+import time
+
+
+class ReplyError(Exception):
+    pass
+
+
+QUEUED = object()
+
+
+def parse_score(text, exclusive_ok=True):
+    text = text.lower()
+    exclusive = exclusive_ok and text.startswith("(")
+    if exclusive:
+        text = text[1:]
+    if text in ("-inf", "+inf", "inf"):
+        return float(text if text != "inf" else "+inf"), exclusive
+    try:
+        return float(text), exclusive
+    except ValueError:
+        raise ReplyError("ERR min or max is not a float") from None
+
+
+class Database:
+    """Keys, their expiry times and a write version per key (for WATCH)."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.versions = {}
+        self.lock = threading.RLock()
+
+    def touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.delete(key)
+        return key in self.data
+
+    def delete(self, key):
+        existed = key in self.data
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+        self.touch(key)
+        return existed
+
+    def value(self, key, kind):
+        if not self.alive(key):
+            return None
+        value = self.data[key]
+        if not isinstance(value, kind):
+            raise ReplyError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    # -- strings ---------------------------------------------------------------
+
+    def cmd_get(self, key):
+        return self.value(key, str)
+
+    def cmd_mget(self, *keys):
+        return [self.value(key, str) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.lower() for option in options]
+        ttl = None
+        if "ex" in options:
+            ttl = float(options[options.index("ex") + 1])
+        if "px" in options:
+            ttl = float(options[options.index("px") + 1]) / 1000
+        if "nx" in options and self.alive(key):
+            return None
+        if "xx" in options and not self.alive(key):
+            return None
+        self.data[key] = value
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl
+        self.touch(key)
+        return "OK"
+
+    def cmd_incrby(self, key, amount):
+        try:
+            value = int(self.value(key, str) or 0) + int(amount)
+        except ValueError:
+            raise ReplyError("ERR value is not an integer or out of range") from None
+        self.data[key] = str(value)
+        self.touch(key)
+        return value
+
+    def cmd_del(self, *keys):
+        return sum(self.delete(key) for key in keys if self.alive(key))
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self.alive(key))
+
+    def cmd_expire(self, key, seconds):
+        if not self.alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + float(seconds)
+        self.touch(key)
+        return 1
+
+    def cmd_ttl(self, key):
+        if not self.alive(key):
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else max(0, round(deadline - time.monotonic()))
+
+    # -- hashes ----------------------------------------------------------------
+
+    def cmd_hincrby(self, key, field, amount):
+        current = self.value(key, dict)
+        if current is None:
+            current = self.data[key] = {}
+        try:
+            current[field] = str(int(current.get(field, 0)) + int(amount))
+        except ValueError:
+            raise ReplyError("ERR hash value is not an integer") from None
+        self.touch(key)
+        return int(current[field])
+
+    def cmd_hgetall(self, key):
+        return dict(self.value(key, dict) or {})
+
+    # -- sets ------------------------------------------------------------------
+
+    def cmd_sadd(self, key, *members):
+        current = self.value(key, set)
+        if current is None:
+            current = self.data[key] = set()
+        added = len(set(members) - current)
+        current.update(members)
+        self.touch(key)
+        return added
+
+    def cmd_smembers(self, key):
+        return sorted(self.value(key, set) or ())
+
+    def cmd_scard(self, key):
+        return len(self.value(key, set) or ())
+
+    # -- sorted sets -----------------------------------------------------------
+
+    def cmd_zadd(self, key, *args):
+        flags = set()
+        while args and args[0].lower() in ("nx", "xx", "ch"):
+            flags.add(args[0].lower())
+            args = args[1:]
+        current = self.value(key, SortedSet)
+        if current is None:
+            current = self.data[key] = SortedSet()
+        added = 0
+        for index in range(0, len(args), 2):
+            member = args[index + 1]
+            exists = member in current.scores
+            if ("nx" in flags and exists) or ("xx" in flags and not exists):
+                continue
+            added += current.add(float(args[index]), member)
+        self.touch(key)
+        return added
+
+    def cmd_zcard(self, key):
+        return len(self.value(key, SortedSet) or ())
+
+    def cmd_zcount(self, key, low, high):
+        current = self.value(key, SortedSet)
+        return len(current.between(parse_score(low), parse_score(high))) if current else 0
+
+    def _range(self, key, low, high, options, reverse):
+        current = self.value(key, SortedSet)
+        items = current.between(parse_score(low), parse_score(high)) if current else []
+        if reverse:
+            items = items[::-1]
+        options = list(options)
+        lowered = [option.lower() for option in options]
+        if "limit" in lowered:
+            at = lowered.index("limit")
+            offset, count = int(options[at + 1]), int(options[at + 2])
+            items = items[offset:] if count < 0 else items[offset : offset + count]
+        if "withscores" in lowered:
+            return [(member, score) for score, member in items]
+        return [member for _, member in items]
+
+    def cmd_zrangebyscore(self, key, low, high, *options):
+        return self._range(key, low, high, options, reverse=False)
+
+    def cmd_zrevrangebyscore(self, key, high, low, *options):
+        return self._range(key, low, high, options, reverse=True)
+
+    # -- server ----------------------------------------------------------------
+
+    def cmd_ping(self, *message):
+        return message[0] if message else "PONG"
+
+    def cmd_select(self, index):
+        return "OK"
+
+    def cmd_flushdb(self, *options):
+        for key in list(self.data):
+            self.delete(key)
+        return "OK"
+
+    def cmd_dbsize(self):
+        return sum(1 for key in list(self.data) if self.alive(key))
+
+    def cmd_client(self, *args):
+        # CLIENT SETINFO and friends, sent by clients on connect.
+        return "OK"
+
+
+class SortedSet:
+    def __init__(self):
+        self.scores = {}
+        self.ordered = []
+
+    def __len__(self):
+        return len(self.ordered)
+
+    def add(self, score, member):
+        previous = self.scores.get(member)
+        if previous is not None:
+            self.ordered.remove((previous, member))
+        self.scores[member] = score
+        bisect.insort(self.ordered, (score, member))
+        return int(previous is None)
+
+    def between(self, low, high):
+        (low_score, low_open), (high_score, high_open) = low, high
+        return [
+            (score, member)
+            for score, member in self.ordered[bisect.bisect_left(self.ordered, (low_score, "")) :]
+            if score <= high_score
+            and not (low_open and score == low_score)
+            and not (high_open and score == high_score)
+        ]
+
+
+class RedisHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.server.stats["connections"] += 1
+        self.watched = {}
+        self.queue = None
+        self.protocol = 2
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.decode("utf-8").split()
+        parts = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(size + 2)[:-2].decode("utf-8"))
+        return parts
+
+    def encode(self, value):
+        if value is None:
+            return b"_\r\n" if self.protocol == 3 else b"$-1\r\n"
+        if isinstance(value, ReplyError):
+            return f"-{value}\r\n".encode("utf-8")
+        if value is QUEUED:
+            return b"+QUEUED\r\n"
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, int):
+            return f":{value}\r\n".encode("ascii")
+        if isinstance(value, float):
+            return f",{value!r}\r\n".encode("ascii") if self.protocol == 3 else self.encode(repr(value))
+        if isinstance(value, tuple):
+            # Member/score pairs: nested under RESP3, flattened under RESP2.
+            return self.encode(list(value))
+        if isinstance(value, list) and value and isinstance(value[0], tuple) and self.protocol == 2:
+            return self.encode([part for pair in value for part in pair])
+        if isinstance(value, dict):
+            if self.protocol == 3:
+                return f"%{len(value)}\r\n".encode("ascii") + b"".join(
+                    self.encode(key) + self.encode(item) for key, item in value.items()
+                )
+            return self.encode([part for pair in value.items() for part in pair])
+        if isinstance(value, list):
+            return f"*{len(value)}\r\n".encode("ascii") + b"".join(self.encode(item) for item in value)
+        if value == "OK" or value == "PONG":
+            return f"+{value}\r\n".encode("ascii")
+        data = str(value).encode("utf-8")
+        return f"${len(data)}\r\n".encode("ascii") + data + b"\r\n"
+
+    def run(self, name, args):
+        method = getattr(self.server.db, f"cmd_{name}", None)
+        if method is None:
+            return ReplyError(f"ERR unknown command '{name}'")
+        try:
+            return method(*args)
+        except ReplyError as exc:
+            return exc
+        except (TypeError, ValueError, IndexError):
+            return ReplyError(f"ERR wrong number or kind of arguments for '{name}' command")
+
+    def execute(self, parts):
+        name, args = parts[0].lower(), parts[1:]
+        db = self.server.db
+        self.server.stats["commands"] += 1
+        if name == "hello":
+            # Clients that ask for RESP3 get it; only maps, nulls, doubles and score pairs differ.
+            self.protocol = int(args[0]) if args else self.protocol
+            return {"server": "redis", "version": "7.0.0", "proto": self.protocol, "id": 1, "mode": "standalone", "role": "master", "modules": []}
+        if name == "multi":
+            self.queue = []
+            return "OK"
+        if name == "discard":
+            self.queue, self.watched = None, {}
+            return "OK"
+        if name == "exec":
+            queued, self.queue = self.queue or [], None
+            with db.lock:
+                changed = any(db.versions.get(key, 0) != version for key, version in self.watched.items())
+                self.watched = {}
+                if changed:
+                    self.server.stats["aborted_transactions"] += 1
+                    return None
+                return [self.run(queued_name, queued_args) for queued_name, queued_args in queued]
+        if self.queue is not None:
+            self.queue.append((name, args))
+            return QUEUED
+        if name == "watch":
+            with db.lock:
+                for key in args:
+                    db.alive(key)
+                    self.watched[key] = db.versions.get(key, 0)
+            return "OK"
+        if name == "unwatch":
+            self.watched = {}
+            return "OK"
+        with db.lock:
+            return self.run(name, args)
+
+    def handle(self):
+        while True:
+            try:
+                parts = self.read_command()
+            except (ConnectionResetError, ValueError):
+                return
+            if parts is None:
+                return
+            if not parts:
+                continue
+            self.wfile.write(self.encode(self.execute(parts)))
+            self.wfile.flush()
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_fake_redis(port=0):
+    server = FakeRedisServer(("127.0.0.1", port), RedisHandler)
+    server.db = Database()
+    server.stats = {"connections": 0, "commands": 0, "aborted_transactions": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server, url = start_fake_redis(args.port)
+    print(f"Fake Redis listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
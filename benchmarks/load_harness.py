@@ -0,0 +1,262 @@
+"""Drive the five-step guided session end to end for N simulated users.
+
+Each user is a headless AppTest session in its own worker process (AppTest sessions
+can't share a process concurrently). The workers share one scratch data directory,
+so they contend on the progress store like replicas on one disk. OpenAI is served by
+the local fake server, so no key or network is needed.
+
+    python benchmarks/load_harness.py --users 8 --journeys 3 --ai --save-baseline benchmarks/load_baseline.json
+    python benchmarks/load_harness.py --users 8 --journeys 3 --ai --compare benchmarks/load_baseline.json
+    python benchmarks/load_harness.py --users 8 --backend redis
+
+The redis backend runs against an in-process fake server unless --redis-url is given.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import progress_store  # noqa: E402
+from fake_openai_server import start_fake_server  # noqa: E402
+from fake_redis_server import start_fake_redis  # noqa: E402
+
+COUNTER = None
+STEPS = ["load", "check_in", "pick_card", "reveal", "coach", "interpret", "action_plan", "wrap_up", "restart"]
+
+
+class StoreCounter:
+    """Counts progress-store operations and raw disk reads/writes while the harness runs."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def wrap(self, owner, name, label):
+        original = getattr(owner, name)
+        counts = self.counts
+        lock = self._lock
+
+        def counted(*args, **kwargs):
+            with lock:
+                counts[label] += 1
+            return original(*args, **kwargs)
+
+        setattr(owner, name, counted)
+
+    def install(self):
+        self.wrap(progress_store, "load_progress_store", "disk_reads")
+        self.wrap(progress_store, "save_progress_store", "disk_writes")
+        for backend in progress_store.BACKENDS.values():
+            self.wrap(backend, "get_profile", "get_profile")
+            self.wrap(backend, "record_session", "record_session")
+            self.wrap(backend, "record_sessions", "batched_writes")
+
+
+def click(app, label=None, key=None):
+    for button in app.button:
+        if (key is not None and button.key == key) or (label is not None and button.label == label):
+            button.click()
+            return
+    raise RuntimeError(f"Button {label or key!r} not found on step {app.session_state.journey_step}")
+
+
+def timed_run(app, step, timings):
+    started = time.perf_counter()
+    app.run()
+    timings[step].append(time.perf_counter() - started)
+    if app.exception:
+        raise RuntimeError(f"{step}: {app.exception[0].message}")
+
+
+def init_worker(url, workdir, backend):
+    if backend:
+        os.environ["PROGRESS_BACKEND"] = backend
+    os.environ["OPENAI_API_KEY"] = "load-harness"
+    os.environ["OPENAI_BASE_URL"] = url
+    os.chdir(workdir)  # keep the simulated users' progress out of the real data/ directory
+    global COUNTER
+    COUNTER = StoreCounter()
+    COUNTER.install()
+
+
+def run_user(user, journeys, use_ai, timeout):
+    timings = defaultdict(list)
+    errors = []
+    COUNTER.counts.clear()
+    try:
+        app = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+        timed_run(app, "load", timings)
+        for journey in range(journeys):
+            app.text_input[0].input(f"Load User {user}")
+            app.slider[0].set_value(1 + (user + journey) % 5)
+            click(app, label="Continue to Card Draw")
+            timed_run(app, "check_in", timings)
+
+            click(app, key=f"guided_card_{(user + journey) % 10}")
+            timed_run(app, "pick_card", timings)
+            click(app, label="Reveal the Session")
+            timed_run(app, "reveal", timings)
+
+            if use_ai and any(button.label == "Generate AI action coach" for button in app.button):
+                click(app, label="Generate AI action coach")
+                timed_run(app, "coach", timings)
+                deadline = time.monotonic() + timeout
+                while app.session_state.coaching_job.poll() == "pending" and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    timed_run(app, "coach", timings)
+
+            click(app, label="Build My Action Plan")
+            timed_run(app, "interpret", timings)
+
+            app.text_area(key="user_next_move").input("Ship the outline by Friday.")
+            click(app, label="Finish Session")
+            timed_run(app, "action_plan", timings)
+            timed_run(app, "wrap_up", timings)
+
+            click(app, label="Start a New Session")
+            timed_run(app, "restart", timings)
+    except Exception as exc:
+        errors.append(f"user {user}: {exc}")
+    return dict(timings), dict(COUNTER.counts), errors
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(timings):
+    summary = {}
+    for step in STEPS:
+        values = timings.get(step)
+        if not values:
+            continue
+        summary[step] = {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values) * 1000, 2),
+            "p90_ms": round(percentile(values, 0.90) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    return summary
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'step':<12}{'baseline p50':>14}{'now p50':>10}{'change':>9}")
+    for step, stats in results["steps"].items():
+        before = baseline["steps"].get(step)
+        if not before:
+            continue
+        change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{step:<12}{before['p50_ms']:>14.1f}{stats['p50_ms']:>10.1f}{change:>+9.0%}{flag}")
+        if flag:
+            regressions.append(step)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--journeys", type=int, default=2, help="full sessions per user")
+    parser.add_argument("--ai", action="store_true", help="also generate AI coaching on each journey")
+    parser.add_argument("--backend", choices=sorted(progress_store.BACKENDS), default=None)
+    parser.add_argument("--redis-url", help="real Redis server for --backend redis")
+    parser.add_argument("--ai-latency", type=float, default=0.3)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    # Workers chdir into a scratch directory, so pin these down first.
+    args.save_baseline = args.save_baseline.resolve() if args.save_baseline else None
+    args.compare = args.compare.resolve() if args.compare else None
+    server, url = start_fake_server(latency=args.ai_latency, token_delay=0.002)
+    workdir = tempfile.mkdtemp(prefix="tarot-load-")
+    if args.backend == "redis":
+        redis_url = args.redis_url
+        if redis_url is None:
+            redis_server, redis_url = start_fake_redis()
+        # A fresh key prefix per run keeps runs against a real server apart.
+        os.environ.update(TAROT_REDIS_URL=redis_url, TAROT_REDIS_PREFIX=f"load-{Path(workdir).name}")
+
+    timings = defaultdict(list)
+    store_io = Counter()
+    errors = []
+    started = time.perf_counter()
+    # Spawned workers import the app's modules afresh, so they read the settings above.
+    with ProcessPoolExecutor(
+        max_workers=args.users,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(url, workdir, args.backend),
+    ) as executor:
+        futures = [
+            executor.submit(run_user, user, args.journeys, args.ai, args.timeout)
+            for user in range(args.users)
+        ]
+        for future in futures:
+            user_timings, user_io, user_errors = future.result()
+            for step, values in user_timings.items():
+                timings[step].extend(values)
+            store_io.update(user_io)
+            errors.extend(user_errors)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    reruns = sum(len(values) for values in timings.values())
+    journeys = args.users * args.journeys - len(errors)
+    results = {
+        "config": {
+            "users": args.users,
+            "journeys": args.journeys,
+            "ai": args.ai,
+            "backend": args.backend or os.getenv("PROGRESS_BACKEND", "json"),
+        },
+        "elapsed_s": round(elapsed, 2),
+        "throughput": {
+            "journeys_per_s": round(journeys / elapsed, 2),
+            "reruns_per_s": round(reruns / elapsed, 2),
+        },
+        "store_io": dict(store_io),
+        "steps": summarize(timings),
+        "errors": errors,
+    }
+
+    print(f"{args.users} users x {args.journeys} journeys in {elapsed:.1f}s")
+    print(f"throughput: {results['throughput']['journeys_per_s']} journeys/s, {results['throughput']['reruns_per_s']} reruns/s")
+    print(f"store I/O: {results['store_io']}")
+    print(f"\n{'step':<12}{'count':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}")
+    for step, stats in results["steps"].items():
+        print(f"{step:<12}{stats['count']:>7}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+    for error in errors:
+        print(f"ERROR {error}")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nSaved baseline to {args.save_baseline}")
+    regressions = []
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.tolerance)
+    if errors or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Check that copying legacy profiles to their ids survives a crash and a rerun.
+
+Seeds profiles under legacy keys with sessions that have no id (as saved before
+session ids existed) and lets migrate-keys crash after writing history but before
+the profiles. Then several threads adopt one name at once and migrate-keys runs again.
+Every copied profile's history must hold exactly its total_sessions.
+
+    python benchmarks/migrate_keys_check.py --backend sqlite
+    python benchmarks/migrate_keys_check.py --backend redis
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import progress_store  # noqa: E402
+from progress_store_stress import make_store  # noqa: E402
+
+NAMES = ["Ada", "Bob", "Cleo"]
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashOnProfiles:
+    """Passes everything through to `store`, but dies when the profiles are written."""
+
+    def __init__(self, store):
+        self.store = store
+        self.history = store.history
+
+    def get_profiles(self, keys):
+        return self.store.get_profiles(keys)
+
+    def replace_stats(self, updates):
+        raise Crash()
+
+
+def seed(store, sessions):
+    for name in NAMES:
+        for index in range(sessions):
+            entry = {
+                "date": f"2025-01-{index % 28 + 1:02d}",
+                "goal": "Migration check",
+                "context": "Project Momentum",
+                "dominant_theme": "focus",
+                "cards": [],
+                "next_move": f"step {index}",
+            }
+            store.record_session(progress_store.legacy_key(name), name, entry)
+
+
+def mismatches(store):
+    wrong = []
+    for name in NAMES:
+        key = progress_store.profile_id(name)
+        profile = store.get_profile(key)
+        kept = len(store.history.sessions(key))
+        if profile is None or profile["total_sessions"] != kept:
+            wrong.append(f"{name}: total {profile and profile['total_sessions']}, history {kept}")
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=list(progress_store.BACKENDS), default="sqlite")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions per legacy profile")
+    parser.add_argument("--threads", type=int, default=4, help="replicas adopting the same name at once")
+    args = parser.parse_args()
+
+    redis_url = None
+    if args.backend == "redis":
+        from fake_redis_server import start_fake_redis
+
+        server, redis_url = start_fake_redis()
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = make_store(args.backend, data_dir, redis_url)
+        seed(store, args.sessions)
+        try:
+            progress_store.migrate_keys(store, CrashOnProfiles(store))
+        except Crash:
+            print("migrate-keys crashed after copying history")
+        # Replicas adopt one name on its owner's first visit, then the rerun copies the rest.
+        workers = [
+            threading.Thread(
+                target=progress_store.adopt_legacy_profile,
+                args=(make_store(args.backend, data_dir, redis_url), NAMES[-1]),
+            )
+            for _ in range(args.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        report = progress_store.migrate_keys(store, store)
+        print(f"rerun copied {report['profiles']} profiles ({report['sessions']} sessions)")
+        wrong = mismatches(store)
+    for line in wrong:
+        print(line)
+    print(f"{args.backend}: {'FAILED' if wrong else 'OK'}")
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
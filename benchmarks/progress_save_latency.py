@@ -0,0 +1,79 @@
+"""Measure how save latency grows with the number of stored profiles, per backend.
+
+    python benchmarks/progress_save_latency.py --profiles 100 1000 10000 --saves 50
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import progress_store  # noqa: E402
+
+
+def seed_profiles(path, count):
+    profiles = {}
+    for number in range(count):
+        profile = progress_store.new_profile(f"User {number}")
+        profile["total_sessions"] = 3
+        profile["theme_counts"] = {"focus": 2, "growth": 1}
+        profile["history"] = [
+            {"date": "2026-01-01", "goal": "Seed", "context": "Project Momentum", "dominant_theme": "focus"}
+        ] * 3
+        profiles[f"user-{number}"] = profile
+    progress_store.save_progress_store({"profiles": profiles}, path)
+
+
+def make_store(backend, data_dir, legacy_json):
+    if backend == "json":
+        return progress_store.JsonProgressStore(legacy_json)
+    if backend == "sqlite":
+        return progress_store.SqliteProgressStore(data_dir / "bench.db", legacy_json=legacy_json)
+    if backend == "sharded":
+        store = progress_store.ShardedProgressStore(data_dir / "bench_shards", legacy_json=None)
+        # Keep the seeded keys as they are, so every backend saves to the same profiles.
+        progress_store.migrate_keys(progress_store.JsonProgressStore(legacy_json), store, rename=False)
+        return store
+    return progress_store.EventLogProgressStore(data_dir / "bench_log", compact_every=0, legacy_json=legacy_json)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["json", "sharded", "sqlite", "eventlog"])
+    parser.add_argument("--profiles", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--saves", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'backend':<10}{'profiles':>10}{'median ms':>12}{'p95 ms':>10}")
+    for backend in args.backends:
+        for count in args.profiles:
+            with tempfile.TemporaryDirectory() as data_dir:
+                data_dir = Path(data_dir)
+                legacy_json = data_dir / "seed.json"
+                seed_profiles(legacy_json, count)
+                store = make_store(backend, data_dir, legacy_json)
+                store.get_profile("user-0")  # warm up: open connections, load snapshots
+                timings = []
+                for index in range(args.saves):
+                    entry = {
+                        "date": "2026-01-02",
+                        "goal": "Bench",
+                        "context": "Project Momentum",
+                        "dominant_theme": "execution",
+                        "cards": [],
+                        "next_move": f"Save {index}",
+                    }
+                    started = time.perf_counter()
+                    store.record_session(f"user-{index % count}", "Bench", entry)
+                    timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{backend:<10}{count:>10}{statistics.median(timings):>12.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
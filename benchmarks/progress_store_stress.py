@@ -0,0 +1,168 @@
+"""Hammer the progress store from many threads and processes at once.
+
+Every writer records sessions for its own profile and for one shared profile.
+Afterwards the totals, and the number of sessions in the shared profile's history,
+must add up exactly; a lost update shows up as a mismatch.
+
+    python benchmarks/progress_store_stress.py --backend json --threads 8 --processes 4 --sessions 50
+    python benchmarks/progress_store_stress.py --backend json --write-behind --flush-ms 50
+    python benchmarks/progress_store_stress.py --backend redis --redis-url redis://localhost:6379/0
+
+With --write-behind, the threads of each process share one write-behind queue, and
+every writer checks that it reads its own saves back immediately. The redis backend
+runs against an in-process fake server unless --redis-url is given; each process
+then stands in for one app replica.
+"""
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import progress_store  # noqa: E402
+from fake_redis_server import start_fake_redis  # noqa: E402
+
+SHARED_KEY = "shared-team"
+
+
+def make_store(backend, data_dir, redis_url=None):
+    data_dir = Path(data_dir)
+    if backend == "redis":
+        # A fresh key prefix per run keeps runs against a real server apart.
+        return progress_store.RedisProgressStore(redis_url, prefix=f"stress-{data_dir.name}")
+    if backend == "sqlite":
+        return progress_store.SqliteProgressStore(data_dir / "stress.db", legacy_json=None)
+    if backend == "sharded":
+        return progress_store.ShardedProgressStore(data_dir / "stress_shards", legacy_json=None)
+    if backend == "eventlog":
+        return progress_store.EventLogProgressStore(data_dir / "stress_log", compact_every=100, legacy_json=None)
+    return progress_store.JsonProgressStore(data_dir / "stress.json")
+
+
+def make_entry(writer, index):
+    return {
+        "id": uuid.uuid4().hex,
+        "date": "2026-01-01",
+        "goal": "Stress test",
+        "context": "Project Momentum",
+        "challenge": f"writer {writer} session {index}",
+        "dominant_theme": ("focus", "growth", "execution")[index % 3],
+        "cards": [],
+        "next_move": "Keep writing",
+    }
+
+
+def run_writer(store, writer, sessions, failures):
+    for index in range(sessions):
+        store.record_session(f"writer-{writer}", f"Writer {writer}", make_entry(writer, index))
+        store.record_session(SHARED_KEY, "Shared", make_entry(writer, index))
+        if isinstance(store, progress_store.WriteBehindProgressStore):
+            profile = store.get_profile(f"writer-{writer}")
+            if profile is None or profile["total_sessions"] != index + 1:
+                failures.append(f"writer-{writer} did not read its own save #{index + 1}")
+
+
+def run_process(backend, data_dir, redis_url, first_writer, threads, sessions, flush_ms):
+    shared = None
+    if flush_ms is not None:
+        shared = progress_store.WriteBehindProgressStore(make_store(backend, data_dir, redis_url), flush_ms=flush_ms)
+    failures = []
+    workers = [
+        threading.Thread(
+            target=run_writer,
+            args=(shared or make_store(backend, data_dir, redis_url), first_writer + offset, sessions, failures),
+        )
+        for offset in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if shared is not None:
+        # Child processes skip atexit handlers, so flush explicitly.
+        shared.close()
+        print(f"process {first_writer // threads}: {shared.flushed} sessions in {shared.batches} batched writes")
+    if failures:
+        print("\n".join(failures[:5]))
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["json", "sqlite", "eventlog", "redis", "sharded"], default="json")
+    parser.add_argument("--threads", type=int, default=4, help="writer threads per process")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=25, help="sessions per writer")
+    parser.add_argument("--write-behind", action="store_true", help="queue saves and write them in batches")
+    parser.add_argument("--flush-ms", type=int, default=progress_store.FLUSH_MS)
+    parser.add_argument("--redis-url", help="real Redis server to test against")
+    args = parser.parse_args()
+
+    redis_url = args.redis_url
+    if args.backend == "redis" and redis_url is None:
+        server, redis_url = start_fake_redis()
+
+    writers = args.threads * args.processes
+    with tempfile.TemporaryDirectory() as data_dir:
+        make_store(args.backend, data_dir, redis_url)
+        started = time.perf_counter()
+        processes = [
+            multiprocessing.Process(
+                target=run_process,
+                args=(
+                    args.backend,
+                    data_dir,
+                    redis_url,
+                    number * args.threads,
+                    args.threads,
+                    args.sessions,
+                    args.flush_ms if args.write_behind else None,
+                ),
+            )
+            for number in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        store = make_store(args.backend, data_dir, redis_url)
+        errors = []
+        for writer in range(writers):
+            profile = store.get_profile(f"writer-{writer}")
+            total = profile["total_sessions"] if profile else 0
+            if total != args.sessions:
+                errors.append(f"writer-{writer}: expected {args.sessions}, found {total}")
+        shared = store.get_profile(SHARED_KEY)
+        shared_total = shared["total_sessions"] if shared else 0
+        if shared_total != writers * args.sessions:
+            errors.append(f"{SHARED_KEY}: expected {writers * args.sessions}, found {shared_total}")
+        history_total = store.history.count_sessions(SHARED_KEY)
+        if history_total != writers * args.sessions:
+            errors.append(f"{SHARED_KEY} history: expected {writers * args.sessions} sessions, found {history_total}")
+        failed_processes = [process.exitcode for process in processes if process.exitcode]
+
+    writes = writers * args.sessions * 2
+    print(f"backend={args.backend}{' (write-behind)' if args.write_behind else ''} writers={writers} ({args.processes} processes x {args.threads} threads)")
+    print(f"{writes} writes in {elapsed:.2f}s -> {writes / elapsed:.1f} writes/s")
+    if args.backend == "redis" and args.redis_url is None:
+        print(f"fake redis: {server.stats['aborted_transactions']} transactions retried after a conflicting write")
+    if failed_processes:
+        errors.append(f"{len(failed_processes)} writer processes exited with errors")
+    if errors:
+        print("LOST UPDATES:")
+        for error in errors:
+            print(f"  {error}")
+        sys.exit(1)
+    print("No lost updates.")
+
+
+if __name__ == "__main__":
+    main()
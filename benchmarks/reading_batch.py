@@ -0,0 +1,63 @@
+"""Compare building readings one at a time with the vectorized batch API.
+
+    python benchmarks/reading_batch.py --readings 20000 --seed 7
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deck import get_pack, shuffled_order  # noqa: E402
+from reading import build_reading, build_readings  # noqa: E402
+
+INPUTS = {
+    "name": "Bench",
+    "energy": 3,
+    "challenge": "Too many open tasks",
+    "goal": "Get unstuck and regain focus",
+    "context": "Project Momentum",
+}
+
+
+def one_at_a_time(count, seed):
+    rng = random.Random(seed)
+    deck_size = len(get_pack().cards)
+    return [
+        build_reading(shuffled_order(rng), rng.randrange(deck_size), INPUTS, seed=rng.getrandbits(64))
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    get_pack().validate()
+    started = time.perf_counter()
+    one_at_a_time(args.readings, args.seed)
+    scalar = time.perf_counter() - started
+
+    started = time.perf_counter()
+    readings = build_readings(INPUTS, args.readings, seed=args.seed)
+    batch = time.perf_counter() - started
+
+    if args.seed is not None:
+        again = build_readings(INPUTS, args.readings, seed=args.seed)
+        same = all(a["cards"] == b["cards"] and a["narrative"] == b["narrative"] for a, b in zip(readings, again))
+        print(f"seeded batch reproducible: {same}")
+    reversed_share = sum(card.is_reversed for reading in readings for card in reading["cards"]) / (3 * len(readings))
+    themes = Counter(reading["dominant_theme"] for reading in readings)
+    print(f"one at a time: {args.readings / scalar:10.0f} readings/s")
+    print(f"batch:         {args.readings / batch:10.0f} readings/s")
+    print(f"reversed share {reversed_share:.3f}, top themes {themes.most_common(3)}")
+
+
+if __name__ == "__main__":
+    main()
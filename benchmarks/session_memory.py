@@ -0,0 +1,79 @@
+"""Estimate per-session memory for the deck and one reading.
+
+Compares the old layout (a deep-copied list of card dicts per session, plus copied
+card dicts in every reading) with the shared-deck layout (a permutation of indices
+plus small DrawnCard references).
+
+    python benchmarks/session_memory.py --sessions 5000
+"""
+
+import argparse
+import copy
+import random
+import sys
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from deck import DrawnCard, get_pack, shuffled_order  # noqa: E402
+
+LABELS = ["Past Influence", "Present Focus", "Future Potential"]
+DECK = get_pack().cards
+LEGACY_DECK = [asdict(card) for card in DECK]
+
+
+def legacy_session():
+    deck = copy.deepcopy(LEGACY_DECK)
+    random.shuffle(deck)
+    reading = []
+    for offset, label in enumerate(LABELS):
+        card = deck[offset]
+        reversed_state = random.random() < 1 / 3
+        reading.append(
+            {
+                **card,
+                "is_reversed": reversed_state,
+                "position_label": label,
+                "card_number": offset + 1,
+                "active_meaning": card["reversed_meaning"] if reversed_state else card["meaning"],
+            }
+        )
+    return deck, reading
+
+
+def shared_session():
+    order = shuffled_order()
+    reading = [
+        DrawnCard(index=order[offset], slot=offset, is_reversed=random.random() < 1 / 3, position_label=label, deck=DECK)
+        for offset, label in enumerate(LABELS)
+    ]
+    return order, reading
+
+
+def measure(factory, sessions):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [factory() for _ in range(sessions)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del kept
+    return total / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5000)
+    args = parser.parse_args()
+
+    legacy = measure(legacy_session, args.sessions)
+    shared = measure(shared_session, args.sessions)
+    print(f"legacy deck copy + card snapshots: {legacy:8.0f} bytes/session")
+    print(f"shared deck + index references:    {shared:8.0f} bytes/session")
+    print(f"saving: {1 - shared / legacy:.0%} ({(legacy - shared) * args.sessions / 1e6:.1f} MB for {args.sessions} sessions)")
+
+
+if __name__ == "__main__":
+    main()
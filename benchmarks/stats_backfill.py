@@ -0,0 +1,91 @@
+"""Recompute profile statistics from history, serially and across cores.
+
+Fills a scratch store with synthetic profiles and sessions, corrupts the counters
+of a few profiles, then runs the backfill with one worker and with one per core,
+and finally with --fix, checking that everything matches its history again.
+
+    python benchmarks/stats_backfill.py --backend sqlite --profiles 5000 --sessions 40
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import progress_store  # noqa: E402
+
+
+def make_store(backend, data_dir):
+    if backend == "sqlite":
+        return progress_store.SqliteProgressStore(data_dir / "bench.db", legacy_json=None)
+    if backend == "eventlog":
+        return progress_store.EventLogProgressStore(data_dir / "bench_log", legacy_json=None)
+    return progress_store.JsonProgressStore(data_dir / "bench.json")
+
+
+def fill(store, profiles, sessions, rng):
+    start = date.today() - timedelta(days=sessions * 3)
+    updates = []
+    for number in range(profiles):
+        day = start
+        for _ in range(sessions):
+            day += timedelta(days=rng.choice((1, 1, 2, 9)))
+            entry = {
+                "id": uuid.uuid4().hex,
+                "date": day.isoformat(),
+                "goal": "Bench",
+                "dominant_theme": rng.choice(("focus", "growth", "execution", "balance")),
+            }
+            updates.append((f"user-{number}", f"User {number}", entry))
+        if len(updates) >= 20000:
+            store.record_sessions(updates)
+            updates = []
+    if updates:
+        store.record_sessions(updates)
+
+
+def show(label, report):
+    seconds = report["seconds"]
+    print(
+        f"{label:<18} {seconds:>7.2f}s  {report['profiles'] / seconds:>8.0f} profiles/s  "
+        f"{report['sessions'] / seconds:>9.0f} sessions/s  consistent {report['consistent']}  "
+        f"fixed {report['fixed']}  mismatched {len(report['mismatched'])}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["json", "sqlite", "eventlog"], default="sqlite")
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=40, help="sessions per profile")
+    parser.add_argument("--corrupt", type=int, default=50, help="profiles whose counters get damaged")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = make_store(args.backend, Path(data_dir))
+        started = time.perf_counter()
+        fill(store, args.profiles, args.sessions, rng)
+        print(f"Loaded {args.profiles} profiles x {args.sessions} sessions in {time.perf_counter() - started:.1f}s")
+        damaged = rng.sample(range(args.profiles), args.corrupt)
+        store.replace_stats({f"user-{number}": {"total_sessions": 1, "streak": 99} for number in damaged})
+
+        show("serial", progress_store.backfill_stats(store, workers=1))
+        show(f"parallel ({args.workers})", progress_store.backfill_stats(store, workers=args.workers))
+        show("parallel --fix", progress_store.backfill_stats(store, workers=args.workers, fix=True))
+        report = progress_store.backfill_stats(store, workers=args.workers)
+        show("check", report)
+        if report["mismatched"] or report["consistent"] != args.profiles:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""One-time process setup.
+
+Streamlit re-executes app.py on every rerun, but a module body only runs once per
+process, so setup that never changes lives here. Import it before the other app
+modules: they read their settings from the environment at import time.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,796 @@
+import hashlib
+import json
+import os
+import copy
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+from instrumentation import collecting, count, instrumented, merge
+from progress_store import atomic_write_text
+from templates import memoized
+
+
+COACH_MODEL = "gpt-4o"
+COACH_MAX_TOKENS = 420
+COACH_TEMPERATURE = 0.7
+SYSTEM_PROMPT = "You convert reflection into practical career coaching."
+CACHE_TTL_SECONDS = int(os.getenv("COACH_CACHE_TTL", "86400"))
+CACHE_SIZE = int(os.getenv("COACH_CACHE_SIZE", "512"))
+CACHE_DISK_DIR = os.getenv("COACH_CACHE_DIR", "")
+CACHE_DISK_SIZE = int(os.getenv("COACH_CACHE_DISK_SIZE", "5000"))
+# When false, the free-text challenge is left out of both the cache key and the
+# prompt, so one cached answer can be shared by everyone with the same spread.
+CACHE_INCLUDES_CHALLENGE = os.getenv("COACH_CACHE_CHALLENGE", "true").lower() in ("1", "true", "yes")
+STREAMING_ENABLED = os.getenv("COACH_STREAMING", "true").lower() in ("1", "true", "yes")
+COACH_WORKERS = int(os.getenv("COACH_WORKERS", "4"))
+COACH_QUEUE_LIMIT = int(os.getenv("COACH_QUEUE_LIMIT", "16"))
+COACH_TIMEOUT_SECONDS = float(os.getenv("COACH_TIMEOUT", "30"))
+COACH_POLL_SECONDS = float(os.getenv("COACH_POLL_SECONDS", "0.5"))
+PREFETCH_ENABLED = os.getenv("COACH_PREFETCH", "false").lower() in ("1", "true", "yes")
+PREFETCH_PER_MINUTE = int(os.getenv("COACH_PREFETCH_PER_MINUTE", "3"))
+PREFETCH_UNCLAIMED_LIMIT = 256
+# Upstream connection, retry and circuit-breaker settings.
+COACH_CONNECT_TIMEOUT = float(os.getenv("COACH_CONNECT_TIMEOUT", "5"))
+COACH_MAX_CONNECTIONS = int(os.getenv("COACH_MAX_CONNECTIONS", "20"))
+COACH_KEEPALIVE_SECONDS = float(os.getenv("COACH_KEEPALIVE_SECONDS", "60"))
+COACH_RETRIES = int(os.getenv("COACH_RETRIES", "2"))
+COACH_RETRY_BASE_SECONDS = float(os.getenv("COACH_RETRY_BASE", "0.5"))
+COACH_RETRY_MAX_SECONDS = 8.0
+# Retries may add at most this fraction on top of first attempts, process-wide.
+COACH_RETRY_BUDGET = float(os.getenv("COACH_RETRY_BUDGET", "0.2"))
+COACH_RETRY_RESERVE = 10
+COACH_BREAKER_FAILURES = int(os.getenv("COACH_BREAKER_FAILURES", "5"))
+COACH_BREAKER_RESET_SECONDS = float(os.getenv("COACH_BREAKER_RESET", "30"))
+# A response slower than this counts as a failure for the circuit breaker.
+COACH_SLOW_SECONDS = float(os.getenv("COACH_SLOW_SECONDS", "20"))
+
+
+def normalize_text(text):
+    return " ".join((text or "").split()).lower()
+
+
+def card_label(card):
+    return card.title + (" reversed" if card.is_reversed else "")
+
+
+def build_coaching_prompt(reading, inputs, include_challenge=CACHE_INCLUDES_CHALLENGE):
+    return memoized(
+        reading,
+        "coaching_prompt",
+        lambda: render_coaching_prompt(reading, inputs, include_challenge),
+        include_challenge,
+        inputs["goal"],
+        inputs["energy"],
+        inputs["challenge"],
+    )
+
+
+def render_coaching_prompt(reading, inputs, include_challenge):
+    challenge = (inputs["challenge"] or "Not provided") if include_challenge else "Not shared"
+    prompt = (
+        "You are a thoughtful career coach. Use the tarot reading only as a reflection lens, "
+        "then turn it into practical output.\n\n"
+        "Return plain text using exactly these sections and labels:\n"
+        "Situation:\n"
+        "Priority:\n"
+        "Next steps:\n"
+        "- ...\n"
+        "- ...\n"
+        "- ...\n"
+        "Message draft:\n"
+        "...\n\n"
+        "Requirements:\n"
+        "- Keep Situation to 2 sentences max.\n"
+        "- Keep Priority to 1 sentence.\n"
+        "- Each next step must be specific, realistic, and doable within 1 week.\n"
+        "- The message draft must be 3-5 sentences and usable for a manager, teammate, or mentor.\n"
+        "- Ground the advice in the user's context, challenge, energy level, and cards.\n"
+        "- Avoid mystical language and avoid repeating the narrative verbatim.\n\n"
+        f"Context: {reading['context']}\n"
+        f"Goal: {inputs['goal']}\n"
+        f"Challenge: {challenge}\n"
+        f"Energy: {inputs['energy']}/5\n"
+        f"Dominant theme: {reading['dominant_theme']}\n"
+        f"Cards: {', '.join([card_label(card) for card in reading['cards']])}\n"
+        f"Narrative: {reading['narrative']}\n"
+    )
+    if include_challenge:
+        # The reflection quotes the challenge back, so it only goes in when the challenge does.
+        prompt += f"Reflection: {reading['reflection']}\n"
+    prompt += f"Current action plan ideas: {' | '.join(reading['action_plan'])}\n"
+    return prompt
+
+
+def coaching_cache_key(reading, inputs, include_challenge=CACHE_INCLUDES_CHALLENGE):
+    return memoized(
+        reading,
+        "coaching_key",
+        lambda: hash_coaching_fields(reading, inputs, include_challenge),
+        include_challenge,
+        inputs["goal"],
+        inputs["energy"],
+        inputs["challenge"],
+    )
+
+
+def hash_coaching_fields(reading, inputs, include_challenge):
+    fields = {
+        "model": COACH_MODEL,
+        "context": reading["context"],
+        "goal": inputs["goal"],
+        "energy": inputs["energy"],
+        "dominant_theme": reading["dominant_theme"],
+        "cards": [
+            [card.title, card.is_reversed, card.position_label]
+            for card in reading["cards"]
+        ],
+    }
+    if include_challenge:
+        fields["challenge"] = normalize_text(inputs["challenge"])
+    payload = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CoachingCache:
+    """Content-addressed coaching outputs: a TTL'd in-memory LRU with an optional on-disk tier."""
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL_SECONDS, disk_dir=CACHE_DISK_DIR, disk_max_entries=CACHE_DISK_SIZE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # The disk tier is trimmed in batches: one directory scan per this many writes.
+        self._evict_every = max(1, disk_max_entries // 10)
+        self._disk_writes = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _expired(self, record):
+        return self.ttl > 0 and time.time() - record["created"] > self.ttl
+
+    def _remember(self, key, record):
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        try:
+            record = json.loads(self._disk_path(key).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if self._expired(record):
+            self._disk_path(key).unlink(missing_ok=True)
+            return None
+        return record
+
+    def _write_disk(self, key, record):
+        if self.disk_dir is None:
+            return
+        atomic_write_text(self._disk_path(key), json.dumps(record))
+        with self._lock:
+            self._disk_writes += 1
+            due = self._disk_writes >= self._evict_every
+            if due:
+                self._disk_writes = 0
+        if due:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Oldest files go first, down to one batch below the cap, so the directory
+        # holds at most disk_max_entries plus one batch per writing process.
+        files = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                pass
+        if len(files) <= self.disk_max_entries:
+            return
+        files.sort()
+        for _, path in files[: len(files) - max(0, self.disk_max_entries - self._evict_every)]:
+            path.unlink(missing_ok=True)
+
+    def _memory_record(self, key):
+        record = self._entries.get(key)
+        if record is not None and self._expired(record):
+            del self._entries[key]
+            return None
+        return record
+
+    def get(self, key):
+        with self._lock:
+            record = self._memory_record(key)
+            if record is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._saved(record)
+        # The disk tier is read without the lock, so a slow disk only delays this lookup.
+        record = self._read_disk(key)
+        with self._lock:
+            if record is None:
+                self.misses += 1
+                return None
+            self._remember(key, record)
+            self.hits += 1
+            self.disk_hits += 1
+            return self._saved(record)
+
+    def _saved(self, record):
+        self.saved_seconds += record.get("latency", 0.0)
+        self.saved_tokens += record.get("tokens", 0)
+        return record["text"]
+
+    def contains(self, key):
+        """Whether `key` is cached, without counting a hit or a miss."""
+        with self._lock:
+            if self._memory_record(key) is not None:
+                return True
+        return self._read_disk(key) is not None
+
+    def put(self, key, text, latency=0.0, tokens=0):
+        record = {"text": text, "created": time.time(), "latency": latency, "tokens": tokens}
+        with self._lock:
+            self._remember(key, record)
+        self._write_disk(key, record)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "saved_seconds": round(self.saved_seconds, 2),
+                "saved_tokens": self.saved_tokens,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_coaching_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CoachingCache()
+    return _cache
+
+
+class CoachingUnavailable(Exception):
+    pass
+
+
+class RetryBudget:
+    """Process-wide cap on retries: each first attempt earns a fraction of a retry.
+
+    When OpenAI is failing for everyone, retries stop instead of multiplying the load.
+    """
+
+    def __init__(self, ratio=COACH_RETRY_BUDGET, reserve=COACH_RETRY_RESERVE):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = float(reserve)
+        self.spent = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+
+class CircuitBreaker:
+    """Stops calling OpenAI after repeated errors or slow answers.
+
+    After COACH_BREAKER_RESET seconds one trial request is let through; if it
+    succeeds quickly the breaker closes again.
+    """
+
+    def __init__(
+        self,
+        failures=COACH_BREAKER_FAILURES,
+        reset_seconds=COACH_BREAKER_RESET_SECONDS,
+        slow_seconds=COACH_SLOW_SECONDS,
+    ):
+        self.threshold = failures
+        self.reset_seconds = reset_seconds
+        self.slow_seconds = slow_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok, seconds=0.0):
+        with self._lock:
+            self._trial = False
+            if ok and seconds < self.slow_seconds:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        # The call ended for reasons that say nothing about upstream health.
+        with self._lock:
+            self._trial = False
+
+
+_client = None
+_client_lock = threading.Lock()
+_breaker = CircuitBreaker()
+_retry_budget = RetryBudget()
+
+
+def coaching_available():
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def get_openai_client():
+    # The SDK is imported and the client built on first use, so pages that never ask
+    # for coaching don't pay for it, and every request after that shares one client
+    # and its pool of kept-alive connections.
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+
+                # The SDK's own Limits class, whichever httpx flavour it ships with.
+                limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+                    max_connections=COACH_MAX_CONNECTIONS,
+                    max_keepalive_connections=COACH_MAX_CONNECTIONS,
+                    keepalive_expiry=COACH_KEEPALIVE_SECONDS,
+                )
+                _client = openai.OpenAI(
+                    # Retries happen in call_openai so they share the budget and breaker.
+                    max_retries=0,
+                    timeout=openai.Timeout(COACH_TIMEOUT_SECONDS, connect=COACH_CONNECT_TIMEOUT),
+                    http_client=openai.DefaultHttpxClient(limits=limits),
+                )
+    return _client
+
+
+def call_openai(send, timeout=COACH_TIMEOUT_SECONDS):
+    """Run send(request_timeout) with jittered exponential retries.
+
+    Retries only cover connection errors, timeouts, 429s and 5xx responses, stop at
+    the overall deadline, and draw from the shared retry budget. Raises
+    CoachingUnavailable without calling out while the circuit breaker is open.
+    """
+    import openai
+
+    retryable = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+    deadline = time.monotonic() + timeout
+    _retry_budget.deposit()
+    attempt = 0
+    while True:
+        if not _breaker.allow():
+            raise CoachingUnavailable("OpenAI is failing or slow right now")
+        started = time.monotonic()
+        remaining = deadline - started
+        try:
+            result = send(openai.Timeout(remaining, connect=min(remaining, COACH_CONNECT_TIMEOUT)))
+        except retryable:
+            _breaker.record(False)
+            delay = random.uniform(0, min(COACH_RETRY_MAX_SECONDS, COACH_RETRY_BASE_SECONDS * 2**attempt))
+            attempt += 1
+            if attempt > COACH_RETRIES or time.monotonic() + delay >= deadline or not _retry_budget.withdraw():
+                raise
+            count("openai_retries")
+            time.sleep(delay)
+            continue
+        except BaseException:
+            _breaker.release()
+            raise
+        _breaker.record(True, time.monotonic() - started)
+        return result
+
+
+def upstream_stats():
+    return {
+        "breaker": _breaker.state,
+        "breaker_opens": _breaker.opens,
+        "retries": _retry_budget.spent,
+        "retries_denied": _retry_budget.denied,
+    }
+
+
+def fallback_coaching(reading):
+    # What the coach panel shows when OpenAI can't answer: the built-in plan.
+    lines = ["Situation:", reading["narrative"], "", "Priority:", reading["action_plan"][0], "", "Next steps:"]
+    lines += [f"- {step}" for step in reading["action_plan"]]
+    return "\n".join(lines)
+
+
+def fallback_result(reading, reason, elapsed=0.0):
+    count("coaching_fallbacks")
+    return {
+        "text": fallback_coaching(reading),
+        "cached": False,
+        "fallback": True,
+        "reason": str(reason) or type(reason).__name__,
+        "first_token_seconds": elapsed,
+        "total_seconds": elapsed,
+    }
+
+
+def coaching_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+@instrumented("openai.request")
+def request_coaching(prompt, timeout=COACH_TIMEOUT_SECONDS):
+    count("openai_requests")
+    response = call_openai(
+        lambda request_timeout: get_openai_client().chat.completions.create(
+            model=COACH_MODEL,
+            messages=coaching_messages(prompt),
+            max_tokens=COACH_MAX_TOKENS,
+            temperature=COACH_TEMPERATURE,
+            timeout=request_timeout,
+        ),
+        timeout,
+    )
+    usage = getattr(response, "usage", None)
+    tokens = getattr(usage, "total_tokens", 0) if usage else 0
+    return response.choices[0].message.content.strip(), tokens
+
+
+@instrumented("openai.stream")
+def stream_coaching(prompt, on_delta, timeout=COACH_TIMEOUT_SECONDS):
+    # Same request as request_coaching, but on_delta sees the text as it grows.
+    # Returns the seconds until the first token alongside the final text.
+    started = time.perf_counter()
+    first_token = None
+    parts = []
+    tokens = 0
+    count("openai_requests")
+    # Retries and the breaker cover opening the stream; the breaker's "slow" check
+    # is therefore about time to first byte, not the length of the answer.
+    response = call_openai(
+        lambda request_timeout: get_openai_client().chat.completions.with_raw_response.create(
+            model=COACH_MODEL,
+            messages=coaching_messages(prompt),
+            max_tokens=COACH_MAX_TOKENS,
+            temperature=COACH_TEMPERATURE,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=request_timeout,
+        ),
+        timeout,
+    ).http_response
+    # The events are read off the raw response rather than the SDK's Stream, which
+    # closes the response at [DONE] before the body ends and so throws the
+    # connection away. Reading to the end lets it go back to the pool.
+    try:
+        for line in response.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                continue
+            chunk = json.loads(data)
+            if chunk.get("error"):
+                import openai
+
+                error = chunk["error"]
+                message = error.get("message") if isinstance(error, dict) else None
+                raise openai.APIError(message or "An error occurred during streaming", request=response.request, body=error)
+            if chunk.get("usage"):
+                tokens = chunk["usage"].get("total_tokens") or 0
+            choices = chunk.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            parts.append(delta)
+            on_delta("".join(parts))
+    finally:
+        response.close()
+    return "".join(parts).strip(), tokens, first_token
+
+
+def cached_result(text, elapsed):
+    return {"text": text, "cached": True, "first_token_seconds": elapsed, "total_seconds": elapsed}
+
+
+def fetch_coaching(key, reading, inputs, on_delta=None, timeout=COACH_TIMEOUT_SECONDS):
+    started = time.perf_counter()
+    prompt = build_coaching_prompt(reading, inputs)
+    if on_delta is not None:
+        text, tokens, first_token = stream_coaching(prompt, on_delta, timeout=timeout)
+    else:
+        text, tokens = request_coaching(prompt, timeout=timeout)
+        first_token = None
+    elapsed = time.perf_counter() - started
+    get_coaching_cache().put(key, text, latency=elapsed, tokens=tokens)
+    return {
+        "text": text,
+        "cached": False,
+        "first_token_seconds": elapsed if first_token is None else first_token,
+        "total_seconds": elapsed,
+    }
+
+
+def generate_coaching(reading, inputs, on_delta=None, timeout=COACH_TIMEOUT_SECONDS):
+    key = coaching_cache_key(reading, inputs)
+    started = time.perf_counter()
+    text = get_coaching_cache().get(key)
+    if text is not None:
+        return cached_result(text, time.perf_counter() - started)
+    return fetch_coaching(key, reading, inputs, on_delta=on_delta, timeout=timeout)
+
+
+class CoachingCancelled(Exception):
+    pass
+
+
+class CoachingJob:
+    """One coaching request running on the shared pool; the page polls it until it settles."""
+
+    def __init__(self, key, timeout=COACH_TIMEOUT_SECONDS, status="pending", speculative=False):
+        self.key = key
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.status = status
+        self.speculative = speculative
+        self.claimed = False
+        self.cancelled = False
+        self.future = None
+        self.partial = ""
+        self.result = None
+        self.error = None
+        # Counts and timings from the worker, handed to the first rerun that sees the
+        # run over (a job can be shared by several sessions).
+        self.metrics = None
+        self._metrics_lock = threading.Lock()
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def update_partial(self, text):
+        if self.cancelled:
+            # Raising from the stream callback closes the HTTP stream early.
+            raise CoachingCancelled()
+        self.partial = text
+
+    def finish(self, result):
+        self.result = result
+        self.status = "done"
+
+    def fail(self, error):
+        self.error = error
+        self.status = "failed"
+
+    def poll(self):
+        if self.status == "pending" and self.remaining() <= 0:
+            self.status = "timeout"
+        if self.status in ("done", "failed") and self.future is not None:
+            # The worker settles the job just before it returns.
+            wait([self.future], timeout=0.1)
+        if self.future is not None and self.future.done():
+            with self._metrics_lock:
+                metrics, self.metrics = self.metrics, None
+            merge(metrics)
+        return self.status
+
+
+class CoachingPool:
+    """Bounded executor for coaching requests so no script thread waits on OpenAI."""
+
+    def __init__(
+        self,
+        workers=COACH_WORKERS,
+        queue_limit=COACH_QUEUE_LIMIT,
+        timeout=COACH_TIMEOUT_SECONDS,
+        prefetch_per_minute=PREFETCH_PER_MINUTE,
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coaching")
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self.timeout = timeout
+        self.prefetch_per_minute = prefetch_per_minute
+        self.rejected = 0
+        self.prefetch_metrics = {
+            "started": 0,
+            "rate_limited": 0,
+            "hits": 0,
+            "cancelled": 0,
+            "wasted": 0,
+        }
+        self._jobs = {}
+        self._speculative = OrderedDict()
+        self._prefetch_times = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def _claim(self, key):
+        with self._lock:
+            job = self._speculative.pop(key, None)
+            if job is not None and not job.cancelled:
+                job.claimed = True
+                self.prefetch_metrics["hits"] += 1
+
+    def _start(self, key, reading, inputs, speculative=False):
+        job = CoachingJob(key, self.timeout, speculative=speculative)
+        self._jobs[key] = job
+        # Widgets keep mutating the session's inputs, so the worker gets its own copy.
+        job.future = self.executor.submit(self._run, job, copy.deepcopy(reading), copy.deepcopy(inputs))
+        return job
+
+    def submit(self, reading, inputs):
+        key = coaching_cache_key(reading, inputs)
+        self._claim(key)
+        started = time.perf_counter()
+        text = get_coaching_cache().get(key)
+        if text is not None:
+            job = CoachingJob(key, self.timeout)
+            job.finish(cached_result(text, time.perf_counter() - started))
+            return job
+        if _breaker.is_open():
+            # Don't tie up a worker on a call that would be refused anyway.
+            job = CoachingJob(key, self.timeout)
+            job.finish(fallback_result(reading, CoachingUnavailable("OpenAI is failing or slow right now")))
+            return job
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.cancelled:
+                # Someone already asked for exactly this reading; share their request.
+                return job
+            if len(self._jobs) >= self.capacity:
+                self.rejected += 1
+                return CoachingJob(key, self.timeout, status="busy")
+            return self._start(key, reading, inputs)
+
+    def _allow_prefetch(self, profile_key):
+        now = time.monotonic()
+        if len(self._prefetch_times) > PREFETCH_UNCLAIMED_LIMIT * 4:
+            self._prefetch_times = {
+                key: stamps for key, stamps in self._prefetch_times.items() if now - stamps[-1] < 60
+            }
+        recent = [stamp for stamp in self._prefetch_times.get(profile_key, []) if now - stamp < 60]
+        if len(recent) >= self.prefetch_per_minute:
+            self._prefetch_times[profile_key] = recent
+            return False
+        recent.append(now)
+        self._prefetch_times[profile_key] = recent
+        return True
+
+    def prefetch(self, reading, inputs, profile_key):
+        # Speculatively start the request the user is likely to make next. Prefetches
+        # only use idle workers, so they never crowd out a real click.
+        key = coaching_cache_key(reading, inputs)
+        if _breaker.is_open() or get_coaching_cache().contains(key):
+            return None
+        with self._lock:
+            if key in self._jobs or len(self._jobs) >= self.workers:
+                return None
+            if not self._allow_prefetch(profile_key):
+                self.prefetch_metrics["rate_limited"] += 1
+                return None
+            self.prefetch_metrics["started"] += 1
+            job = self._start(key, reading, inputs, speculative=True)
+            self._speculative[key] = job
+            while len(self._speculative) > PREFETCH_UNCLAIMED_LIMIT:
+                self._speculative.popitem(last=False)
+                self.prefetch_metrics["wasted"] += 1
+        return job
+
+    def cancel(self, job):
+        if job is None or job.claimed or job.cancelled:
+            return
+        with self._lock:
+            self._speculative.pop(job.key, None)
+            job.cancelled = True
+            self.prefetch_metrics["cancelled"] += 1
+            if job.future is not None and job.future.cancel():
+                self._jobs.pop(job.key, None)
+            else:
+                # Already running or finished, so the upstream call was spent for nothing.
+                self.prefetch_metrics["wasted"] += 1
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.prefetch_metrics)
+            metrics["hit_rate"] = metrics["hits"] / metrics["started"] if metrics["started"] else 0.0
+            return {
+                "in_flight": len(self._jobs),
+                "rejected": self.rejected,
+                "prefetch": metrics,
+                "upstream": upstream_stats(),
+            }
+
+    def _run(self, job, reading, inputs):
+        with collecting() as job.metrics:
+            self._fetch(job, reading, inputs)
+
+    def _fetch(self, job, reading, inputs):
+        try:
+            if job.remaining() <= 0:
+                job.poll()
+                return
+            # Prefetches always stream so a cancel can cut the request short.
+            on_delta = job.update_partial if STREAMING_ENABLED or job.speculative else None
+            job.finish(fetch_coaching(job.key, reading, inputs, on_delta=on_delta, timeout=job.remaining()))
+        except CoachingCancelled as exc:
+            job.fail(exc)
+        except Exception as exc:
+            # Degrade to the reading's own plan rather than an error message.
+            job.finish(fallback_result(reading, exc, job.timeout - job.remaining()))
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_coaching_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CoachingPool()
+    return _pool
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+
+PACKS_DIR = Path(os.getenv("TAROT_PACKS_DIR", Path(__file__).resolve().parent / "packs"))
+PACK_NAME = os.getenv("TAROT_PACK", "default")
+# How often (seconds) to check pack files for edits; 0 turns hot reloading off.
+PACK_RELOAD_SECONDS = float(os.getenv("TAROT_PACK_RELOAD_SECONDS", "2"))
+CARD_FIELDS = ("title", "emoji", "meaning", "reversed_meaning", "theme")
+CONTEXT_FIELDS = ("intro", "focus_prompt", "action_hint")
+
+logger = logging.getLogger(__name__)
+
+
+class PackError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Card:
+    title: str
+    emoji: str
+    meaning: str
+    reversed_meaning: str
+    theme: str
+
+
+@dataclass(frozen=True, slots=True)
+class CareerContext:
+    name: str
+    intro: str
+    focus_prompt: str
+    reflection_questions: tuple
+    action_hint: str
+
+
+@dataclass(frozen=True, slots=True)
+class DrawnCard:
+    """A card in a reading: an index into the shared deck plus how it was drawn."""
+
+    index: int
+    slot: int
+    is_reversed: bool
+    position_label: str
+    # The deck the card was drawn from, so a pack reload can't change a reading
+    # that is already on screen. Shared, never copied.
+    deck: tuple = field(default=None, repr=False, compare=False)
+
+    @property
+    def card(self):
+        return (self.deck or get_pack().cards)[self.index]
+
+    @property
+    def title(self):
+        return self.card.title
+
+    @property
+    def emoji(self):
+        return self.card.emoji
+
+    @property
+    def theme(self):
+        return self.card.theme
+
+    @property
+    def meaning(self):
+        return self.card.meaning
+
+    @property
+    def reversed_meaning(self):
+        return self.card.reversed_meaning
+
+    @property
+    def active_meaning(self):
+        return self.card.reversed_meaning if self.is_reversed else self.card.meaning
+
+    @property
+    def card_number(self):
+        return self.slot + 1
+
+
+def read_pack_file(path):
+    if path.suffix == ".toml":
+        if tomllib is None:
+            raise PackError(f"{path}: TOML packs need Python 3.11 or newer.")
+        with open(path, "rb") as handle:
+            return tomllib.load(handle)
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def find_pack_file(pack_dir, stem):
+    for suffix in (".json", ".toml"):
+        path = pack_dir / f"{stem}{suffix}"
+        if path.exists():
+            return path
+    raise PackError(f"{pack_dir} has no {stem}.json or {stem}.toml")
+
+
+def require_text(value, where):
+    if not isinstance(value, str) or not value.strip():
+        raise PackError(f"{where} must be a non-empty string")
+    return value
+
+
+def compile_cards(data, source):
+    cards = data.get("cards") if isinstance(data, dict) else None
+    if not isinstance(cards, list) or not cards:
+        raise PackError(f"{source}: expected a non-empty 'cards' list")
+    compiled = []
+    for number, card in enumerate(cards, start=1):
+        if not isinstance(card, dict):
+            raise PackError(f"{source}: card {number} must be a table/object")
+        compiled.append(Card(**{name: require_text(card.get(name), f"{source}: card {number} '{name}'") for name in CARD_FIELDS}))
+    titles = [card.title for card in compiled]
+    if len(set(titles)) != len(titles):
+        raise PackError(f"{source}: card titles must be unique")
+    return tuple(compiled)
+
+
+def compile_contexts(data, source):
+    if not isinstance(data, dict):
+        raise PackError(f"{source}: expected an object with 'goals' and 'contexts'")
+    goals = data.get("goals")
+    if not isinstance(goals, list) or not goals:
+        raise PackError(f"{source}: expected a non-empty 'goals' list")
+    goals = tuple(require_text(goal, f"{source}: goal") for goal in goals)
+    if len(set(goals)) != len(goals):
+        raise PackError(f"{source}: goals must be unique")
+    contexts = data.get("contexts")
+    if not isinstance(contexts, dict) or not contexts:
+        raise PackError(f"{source}: expected a non-empty 'contexts' table")
+    compiled = {}
+    for name, context in contexts.items():
+        where = f"{source}: context '{name}'"
+        if not isinstance(context, dict):
+            raise PackError(f"{where} must be a table/object")
+        questions = context.get("reflection_questions")
+        if not isinstance(questions, list) or not questions:
+            raise PackError(f"{where} needs a non-empty 'reflection_questions' list")
+        compiled[name] = CareerContext(
+            name=name,
+            reflection_questions=tuple(require_text(question, f"{where} question") for question in questions),
+            **{key: require_text(context.get(key), f"{where} '{key}'") for key in CONTEXT_FIELDS},
+        )
+    return goals, compiled
+
+
+class Pack:
+    """A validated deck/context pack plus the lookup indexes the app needs on every rerun.
+
+    The deck and the contexts are parsed separately and only on first use, so a
+    large deck costs nothing until someone actually draws or browses cards.
+    """
+
+    def __init__(self, pack_dir):
+        self.pack_dir = Path(pack_dir)
+        self.deck_path = find_pack_file(self.pack_dir, "deck")
+        self.contexts_path = find_pack_file(self.pack_dir, "contexts")
+        self._lock = threading.Lock()
+        self._deck = None
+        self._contexts = None
+
+    def signature(self):
+        return tuple(
+            (path.stat().st_mtime_ns, path.stat().st_size) for path in (self.deck_path, self.contexts_path)
+        )
+
+    def _load_deck(self):
+        with self._lock:
+            if self._deck is None:
+                cards = compile_cards(read_pack_file(self.deck_path), self.deck_path)
+                by_theme = {}
+                for index, card in enumerate(cards):
+                    by_theme.setdefault(card.theme, []).append(index)
+                self._deck = {
+                    "cards": cards,
+                    "by_title": {card.title: index for index, card in enumerate(cards)},
+                    "by_theme": {theme: tuple(indexes) for theme, indexes in by_theme.items()},
+                }
+        return self._deck
+
+    def _load_contexts(self):
+        with self._lock:
+            if self._contexts is None:
+                goals, contexts = compile_contexts(read_pack_file(self.contexts_path), self.contexts_path)
+                names = tuple(contexts)
+                self._contexts = {
+                    "goals": goals,
+                    "goal_index": {goal: index for index, goal in enumerate(goals)},
+                    "contexts": contexts,
+                    "context_names": names,
+                    "context_index": {name: index for index, name in enumerate(names)},
+                }
+        return self._contexts
+
+    def validate(self):
+        self._load_deck()
+        self._load_contexts()
+        return self
+
+    @property
+    def cards(self):
+        return self._load_deck()["cards"]
+
+    @property
+    def cards_by_title(self):
+        return self._load_deck()["by_title"]
+
+    @property
+    def cards_by_theme(self):
+        return self._load_deck()["by_theme"]
+
+    @property
+    def goals(self):
+        return self._load_contexts()["goals"]
+
+    @property
+    def goal_index(self):
+        return self._load_contexts()["goal_index"]
+
+    @property
+    def contexts(self):
+        return self._load_contexts()["contexts"]
+
+    @property
+    def context_names(self):
+        return self._load_contexts()["context_names"]
+
+    @property
+    def context_index(self):
+        return self._load_contexts()["context_index"]
+
+
+_pack = None
+_pack_signature = None
+_pack_checked = 0.0
+_pack_lock = threading.Lock()
+
+
+def load_pack(name=PACK_NAME, packs_dir=PACKS_DIR):
+    return Pack(Path(packs_dir) / name)
+
+
+def get_pack():
+    # One compiled pack per process. Edits to the pack files are picked up at most
+    # every PACK_RELOAD_SECONDS; a broken edit is logged and the last good pack stays.
+    global _pack, _pack_signature, _pack_checked
+    now = time.monotonic()
+    if _pack is not None and (PACK_RELOAD_SECONDS <= 0 or now - _pack_checked < PACK_RELOAD_SECONDS):
+        return _pack
+    with _pack_lock:
+        if _pack is None:
+            _pack = load_pack()
+            _pack_signature = _pack.signature()
+            _pack_checked = now
+            return _pack
+        if now - _pack_checked < PACK_RELOAD_SECONDS:
+            return _pack
+        _pack_checked = now
+        try:
+            signature = _pack.signature()
+            if signature != _pack_signature:
+                # Remember the signature even if the edit is bad, so it is reported once.
+                _pack_signature = signature
+                _pack = load_pack().validate()
+                logger.info("Reloaded tarot pack from %s", _pack.pack_dir)
+        except (OSError, PackError, ValueError) as exc:
+            logger.warning("Keeping the previous tarot pack; reload failed: %s", exc)
+    return _pack
+
+
+def shuffled_order(rng=random):
+    # A session only keeps this permutation; the cards themselves are shared by everyone.
+    order = list(range(len(get_pack().cards)))
+    rng.shuffle(order)
+    return tuple(order)
@@ -0,0 +1,178 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+
+PROFILING_ENABLED = os.getenv("TAROT_PROFILING", "false").lower() in ("1", "true", "yes")
+METRICS_FILE = Path(os.getenv("TAROT_METRICS_FILE", "data/metrics.prom"))
+RECENT_RERUNS = int(os.getenv("TAROT_PROFILING_HISTORY", "20"))
+
+logger = logging.getLogger("tarot.perf")
+if PROFILING_ENABLED and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_current = ContextVar("tarot_rerun", default=None)
+_recent = deque(maxlen=RECENT_RERUNS)
+_lock = threading.Lock()
+_section_seconds = defaultdict(float)
+_section_calls = defaultdict(int)
+_counters = defaultdict(int)
+_reruns = 0
+
+
+def _new_record():
+    return {
+        "started": time.time(),
+        "_t0": time.perf_counter(),
+        "sections": defaultdict(float),
+        "counts": defaultdict(int),
+    }
+
+
+def start_rerun():
+    if not PROFILING_ENABLED:
+        return
+    if _current.get() is not None:
+        # st.rerun() aborts the script before finish_rerun gets a chance to run.
+        finish_rerun(status="interrupted")
+    _current.set(_new_record())
+
+
+def finish_rerun(status="ok"):
+    global _reruns
+    record = _current.get()
+    if not PROFILING_ENABLED or record is None:
+        return
+    _current.set(None)
+    summary = {
+        "at": time.strftime("%H:%M:%S", time.localtime(record["started"])),
+        "status": status,
+        "total_ms": round((time.perf_counter() - record["_t0"]) * 1000, 2),
+        "sections_ms": {name: round(seconds * 1000, 2) for name, seconds in record["sections"].items()},
+        "counts": dict(record["counts"]),
+    }
+    with _lock:
+        _reruns += 1
+        _recent.append(summary)
+    logger.info(json.dumps({"event": "rerun", **summary}))
+    write_metrics_file()
+
+
+def record(name, seconds):
+    with _lock:
+        _section_seconds[name] += seconds
+        _section_calls[name] += 1
+    current = _current.get()
+    if current is not None:
+        current["sections"][name] += seconds
+
+
+def count(name, amount=1):
+    if not PROFILING_ENABLED:
+        return
+    with _lock:
+        _counters[name] += amount
+    current = _current.get()
+    if current is not None:
+        current["counts"][name] += amount
+
+
+@contextmanager
+def collecting():
+    """Gather the counts and timings of work running off the script thread.
+
+    Worker threads don't see the rerun that asked for their work, so they collect
+    into a record of their own; merge() folds it into the rerun that picks it up.
+    Yields None when profiling is off.
+    """
+    if not PROFILING_ENABLED:
+        yield None
+        return
+    token = _current.set(_new_record())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def merge(collected):
+    current = _current.get()
+    if collected is None or current is None:
+        return
+    for name, seconds in collected["sections"].items():
+        current["sections"][name] += seconds
+    for name, amount in collected["counts"].items():
+        current["counts"][name] += amount
+
+
+@contextmanager
+def timed(name):
+    if not PROFILING_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def instrumented(name=None):
+    # Decorator form of timed(); returns the function untouched when profiling is off,
+    # so the default configuration pays nothing.
+    def decorate(func):
+        if not PROFILING_ENABLED:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def recent_reruns():
+    with _lock:
+        return list(_recent)
+
+
+def render_prometheus():
+    with _lock:
+        lines = [
+            "# HELP tarot_reruns_total Completed script reruns.",
+            "# TYPE tarot_reruns_total counter",
+            f"tarot_reruns_total {_reruns}",
+            "# HELP tarot_section_seconds Time spent per instrumented section.",
+            "# TYPE tarot_section_seconds summary",
+        ]
+        for name in sorted(_section_seconds):
+            lines.append(f'tarot_section_seconds_sum{{section="{name}"}} {_section_seconds[name]:.6f}')
+            lines.append(f'tarot_section_seconds_count{{section="{name}"}} {_section_calls[name]}')
+        lines.append("# HELP tarot_events_total Disk reads/writes, store operations and OpenAI requests.")
+        lines.append("# TYPE tarot_events_total counter")
+        for name in sorted(_counters):
+            lines.append(f'tarot_events_total{{event="{name}"}} {_counters[name]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=None):
+    path = Path(path or METRICS_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp.write_text(render_prometheus(), encoding="utf-8")
+    os.replace(temp, path)
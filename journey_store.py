@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from deck import DrawnCard
+from instrumentation import count
+from progress_store import DATA_DIR, REDIS_PREFIX, REDIS_URL, atomic_write_text, redis_client
+
+
+# Where in-progress journeys are kept between reruns: "none" (process memory only,
+# the Streamlit default), "file" (shared disk) or "redis" (shared by every replica).
+JOURNEY_STORE = os.getenv("TAROT_JOURNEY_STORE", "none").lower()
+JOURNEY_DIR = Path(os.getenv("TAROT_JOURNEY_DIR", str(DATA_DIR / "journeys")))
+JOURNEY_TTL_SECONDS = int(os.getenv("TAROT_JOURNEY_TTL", str(7 * 24 * 3600)))
+# Session-state keys that make up a journey. Coaching jobs belong to the process
+# that started them and are not kept; a restored journey can request a new one.
+# The note to future you is not needed to carry on, so it stays off shared storage.
+JOURNEY_KEYS = (
+    "anonymous_id",
+    "deck_order",
+    "journey_step",
+    "selected_seed_index",
+    "guided_inputs",
+    "guided_reading",
+    "reading_saved",
+    "user_next_move",
+)
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+logger = logging.getLogger(__name__)
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def valid_session_id(sid):
+    return bool(sid) and SESSION_ID_PATTERN.match(sid) is not None
+
+
+def dump_reading(reading):
+    # Cards are stored by deck position only; their text comes from the pack on restore.
+    cards = [
+        {"index": card.index, "slot": card.slot, "is_reversed": card.is_reversed, "position_label": card.position_label}
+        for card in reading["cards"]
+    ]
+    return {**reading, "cards": cards}
+
+
+def load_reading(data, pack):
+    if any(card["index"] >= len(pack.cards) for card in data["cards"]):
+        return None
+    cards = [DrawnCard(**card, deck=pack.cards) for card in data["cards"]]
+    return {**data, "cards": cards, "reflection_questions": tuple(data["reflection_questions"])}
+
+
+def dump_journey(state):
+    """The journey part of `state` as JSON; equal text means nothing changed."""
+    journey = {key: state[key] for key in JOURNEY_KEYS if key in state}
+    if journey.get("guided_reading"):
+        journey["guided_reading"] = dump_reading(journey["guided_reading"])
+    return json.dumps(journey, sort_keys=True)
+
+
+def restore_journey(state, text, pack):
+    journey = json.loads(text)
+    if len(journey.get("deck_order", ())) != len(pack.cards):
+        # The pack changed size since this journey was saved: its draw no longer
+        # applies, so only the check-in answers carry over.
+        journey = {key: journey[key] for key in ("guided_inputs", "anonymous_id") if key in journey}
+    if journey.get("guided_reading"):
+        journey["guided_reading"] = load_reading(journey["guided_reading"], pack)
+    if journey.get("journey_step", 0) >= 2 and not journey.get("guided_reading"):
+        journey["journey_step"] = 1
+    for key, value in journey.items():
+        state[key] = value
+
+
+class FileJourneyStore:
+    """One JSON file per visitor; works for replicas that share a disk."""
+
+    def __init__(self, directory=JOURNEY_DIR, ttl=JOURNEY_TTL_SECONDS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.purge_expired()
+
+    def path(self, sid):
+        return self.directory / f"{sid}.json"
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def load(self, sid):
+        path = self.path(sid)
+        count("disk_reads")
+        try:
+            if path.stat().st_mtime < time.time() - self.ttl:
+                return None
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            logger.warning("Could not load journey %s: %s", sid, exc)
+            return None
+
+    def save(self, sid, text):
+        count("disk_writes")
+        try:
+            atomic_write_text(self.path(sid), text)
+        except OSError as exc:
+            logger.warning("Could not save journey %s: %s", sid, exc)
+
+    def delete(self, sid):
+        try:
+            self.path(sid).unlink(missing_ok=True)
+        except OSError as exc:
+            logger.warning("Could not delete journey %s: %s", sid, exc)
+
+
+class RedisJourneyStore:
+    """One Redis string per visitor, expiring JOURNEY_TTL_SECONDS after the last change."""
+
+    def __init__(self, url=REDIS_URL, prefix=REDIS_PREFIX, ttl=JOURNEY_TTL_SECONDS):
+        import redis
+
+        self.client = redis_client(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.errors = (redis.RedisError,)
+
+    def key(self, sid):
+        return f"{self.prefix}:journey:{sid}"
+
+    def load(self, sid):
+        count("disk_reads")
+        try:
+            return self.client.get(self.key(sid))
+        except self.errors as exc:
+            # A visitor without their saved journey starts over; the page still works.
+            logger.warning("Could not load journey %s: %s", sid, exc)
+            return None
+
+    def save(self, sid, text):
+        count("disk_writes")
+        try:
+            self.client.set(self.key(sid), text, ex=self.ttl)
+        except self.errors as exc:
+            logger.warning("Could not save journey %s: %s", sid, exc)
+
+    def delete(self, sid):
+        try:
+            self.client.delete(self.key(sid))
+        except self.errors as exc:
+            logger.warning("Could not delete journey %s: %s", sid, exc)
+
+
+JOURNEY_BACKENDS = {
+    "file": FileJourneyStore,
+    "redis": RedisJourneyStore,
+}
+
+_journeys = None
+_journeys_lock = threading.Lock()
+
+
+def get_journey_store():
+    """The configured journey store, or None when journeys stay in process memory."""
+    global _journeys
+    if JOURNEY_STORE == "none":
+        return None
+    if _journeys is None:
+        with _journeys_lock:
+            if _journeys is None:
+                if JOURNEY_STORE not in JOURNEY_BACKENDS:
+                    raise ValueError(
+                        f"Unknown TAROT_JOURNEY_STORE '{JOURNEY_STORE}'. Choose from: none, {', '.join(JOURNEY_BACKENDS)}"
+                    )
+                _journeys = JOURNEY_BACKENDS[JOURNEY_STORE]()
+    return _journeys
@@ -0,0 +1,1499 @@
+import argparse
+import atexit
+import concurrent.futures
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+from instrumentation import count, instrumented
+from stats import STAT_FIELDS, apply_stats, new_stats, recompute_stats, stats_mismatch
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DATA_DIR = Path("data")
+PROGRESS_FILE = DATA_DIR / "user_progress.json"
+PROGRESS_DB = DATA_DIR / "user_progress.db"
+# Sessions kept on the profile summary itself; the full history lives in SessionHistory.
+HISTORY_LIMIT = 10
+HISTORY_PAGE_SIZE = int(os.getenv("PROGRESS_HISTORY_PAGE", "20"))
+HISTORY_DB_NAME = "session_history.db"
+PROFILE_CACHE_SIZE = int(os.getenv("PROGRESS_CACHE_SIZE", "1024"))
+EVENT_LOG_DIR = DATA_DIR / "progress_log"
+# Sharded JSON backend: profiles spread over PROGRESS_SHARDS files by key hash.
+SHARD_DIR = Path(os.getenv("PROGRESS_SHARD_DIR", str(DATA_DIR / "progress_shards")))
+PROGRESS_SHARDS = int(os.getenv("PROGRESS_SHARDS", "16"))
+COMPACT_EVERY = int(os.getenv("PROGRESS_COMPACT_EVERY", "500"))
+# Write-behind: queue finished sessions and write them in batches every
+# PROGRESS_FLUSH_MS or PROGRESS_FLUSH_EVENTS sessions, whichever comes first.
+WRITE_BEHIND = os.getenv("PROGRESS_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+FLUSH_MS = int(os.getenv("PROGRESS_FLUSH_MS", "200"))
+FLUSH_EVENTS = int(os.getenv("PROGRESS_FLUSH_EVENTS", "50"))
+# Shared Redis backend, for running several app replicas against one store.
+REDIS_URL = os.getenv("TAROT_REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("TAROT_REDIS_PREFIX", "tarot")
+REDIS_MAX_RETRIES = 50
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_ID_PATTERN = re.compile(r"^[ua]-[0-9a-f]{32}$")
+# Before per-visitor ids every anonymous visitor saved into this one profile.
+LEGACY_GUEST_KEY = "guest"
+
+
+def normalize_name(name):
+    # Case, Unicode compatibility forms and extra spaces don't make a different person.
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+def profile_id(name):
+    """Stable store key for a display name: "u-" plus a hash of the normalized name."""
+    return "u-" + hashlib.sha256(normalize_name(name).encode("utf-8")).hexdigest()[:32]
+
+
+def anonymous_profile_id(browser_id):
+    # Visitors who leave the name blank get a profile per browser instead of one shared "guest".
+    return "a-" + hashlib.sha256(browser_id.encode("utf-8")).hexdigest()[:32]
+
+
+def is_profile_id(key):
+    return PROFILE_ID_PATTERN.match(key) is not None
+
+
+def shard_for(key, shards):
+    return int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) % shards
+
+
+def new_profile(display_name):
+    return {
+        "display_name": display_name,
+        "total_sessions": 0,
+        "last_session_date": None,
+        "streak": 0,
+        "best_streak": 0,
+        "theme_counts": {},
+        "stats": new_stats(),
+        "history": [],
+    }
+
+
+class ProgressStoreError(Exception):
+    pass
+
+
+def apply_session(profile, entry):
+    apply_stats(profile, entry)
+    profile["history"] = ([entry] + profile.get("history", []))[:HISTORY_LIMIT]
+    return profile
+
+
+@contextmanager
+def file_lock(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_text(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+
+def connect_sqlite(path):
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    # Switching a new file to WAL needs it to itself for a moment, and that step
+    # doesn't wait on the busy timeout; processes starting together retry it.
+    for attempt in range(100):
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            break
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc) or attempt == 99:
+                raise
+            time.sleep(0.05)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def run_schema(conn, schema):
+    for statement in schema.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def ensure_progress_store(path=PROGRESS_FILE):
+    if not path.exists():
+        with file_lock(lock_path_for(path)):
+            if not path.exists():
+                atomic_write_text(path, json.dumps({"profiles": {}}, indent=2))
+
+
+def lock_path_for(path):
+    return path.with_name(path.name + ".lock")
+
+
+def load_progress_store(path=PROGRESS_FILE, strict=False):
+    count("disk_reads")
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"profiles": {}}
+    except json.JSONDecodeError as exc:
+        # Readers can fall back to an empty store, but writers must never replace
+        # a damaged file with that empty store and wipe everyone's progress.
+        if strict:
+            raise ProgressStoreError(f"{path} is not valid JSON; refusing to overwrite it.") from exc
+        return {"profiles": {}}
+
+
+def save_progress_store(store, path=PROGRESS_FILE):
+    count("disk_writes")
+    atomic_write_text(path, json.dumps(store, indent=2))
+
+
+class ProfileCache:
+    """LRU of parsed profiles, valid only while the backing file signature is unchanged."""
+
+    MISSING = object()
+
+    def __init__(self, max_entries=PROFILE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, signature, key):
+        with self._lock:
+            if signature != self.signature or key not in self._entries:
+                self.misses += 1
+                return self.MISSING
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return copy.deepcopy(self._entries[key])
+
+    def put(self, signature, key, profile):
+        with self._lock:
+            if signature != self.signature:
+                self._entries.clear()
+                self.signature = signature
+            self._entries[key] = copy.deepcopy(profile)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.signature = None
+
+
+class SessionHistory:
+    """Every finished session, one row each, indexed by profile and date.
+
+    Profiles only keep their last HISTORY_LIMIT sessions; older ones are read from
+    here a page at a time. Rows carry the session's id, so appending the same
+    session twice (a retried batch) stores it once.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_key TEXT NOT NULL,
+            date TEXT NOT NULL,
+            entry TEXT NOT NULL,
+            session_id TEXT
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # One transaction, so processes starting together on a new file don't race
+        # each other through the checks below.
+        with self.transaction() as conn:
+            run_schema(conn, self.SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+            if "session_id" not in columns:
+                # Older SQLite progress databases predate session ids.
+                conn.execute("ALTER TABLE history ADD COLUMN session_id TEXT")
+            # Unique per profile, so migrate-keys can copy a session to its new profile id
+            # in the same file; older databases had one global index.
+            conn.execute("DROP INDEX IF EXISTS history_session")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS history_profile_session ON history (profile_key, session_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS history_profile_date ON history (profile_key, date, id)")
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def append(self, updates, conn=None):
+        """Store (key, entry) pairs; pass `conn` to join a transaction already open on this file."""
+        if conn is None:
+            with self.transaction() as conn:
+                return self.append(updates, conn)
+        count("disk_writes")
+        conn.executemany(
+            "INSERT OR IGNORE INTO history (profile_key, date, entry, session_id) VALUES (?, ?, ?, ?)",
+            [(key, entry["date"], json.dumps(entry), entry.get("id")) for key, entry in updates],
+        )
+
+    def recent(self, key, limit=HISTORY_LIMIT, conn=None):
+        count("disk_reads")
+        rows = (conn or self.connect()).execute(
+            "SELECT entry FROM history WHERE profile_key = ? ORDER BY date DESC, id DESC LIMIT ?",
+            (key, limit),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    @instrumented("store.history")
+    def page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        """One page of a profile's sessions, newest first.
+
+        `start`/`end` are inclusive ISO dates. Returns (entries, next_cursor); pass the
+        cursor back for the following page, it is None after the last one.
+        """
+        clauses, params = ["profile_key = ?"], [key]
+        if start:
+            clauses.append("date >= ?")
+            params.append(str(start))
+        if end:
+            clauses.append("date <= ?")
+            params.append(str(end))
+        if cursor:
+            # Keyset pagination: continue after the last row shown, however deep.
+            cursor_date, cursor_id = cursor.rsplit(":", 1)
+            clauses.append("(date < ? OR (date = ? AND id < ?))")
+            params += [cursor_date, cursor_date, int(cursor_id)]
+        count("disk_reads")
+        rows = self.connect().execute(
+            f"SELECT id, date, entry FROM history WHERE {' AND '.join(clauses)} ORDER BY date DESC, id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        next_cursor = f"{rows[limit - 1][1]}:{rows[limit - 1][0]}" if len(rows) > limit else None
+        return [json.loads(row[2]) for row in rows[:limit]], next_cursor
+
+    def count_sessions(self, key, start=None, end=None):
+        count("disk_reads")
+        return self.connect().execute(
+            "SELECT COUNT(*) FROM history WHERE profile_key = ? AND date >= ? AND date <= ?",
+            (key, str(start or ""), str(end or "9999-12-31")),
+        ).fetchone()[0]
+
+    def profile_keys(self):
+        count("disk_reads")
+        return [row[0] for row in self.connect().execute("SELECT DISTINCT profile_key FROM history ORDER BY profile_key")]
+
+    def sessions(self, key):
+        count("disk_reads")
+        rows = self.connect().execute(
+            "SELECT entry FROM history WHERE profile_key = ? ORDER BY date, id",
+            (key,),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __reduce__(self):
+        # Backfill workers get the path and open their own connection.
+        return (SessionHistory, (self.path,))
+
+    def import_profiles(self, load_profiles):
+        # One-time copy of the sessions embedded in existing profiles; load_profiles()
+        # is only called if that hasn't happened yet.
+        with self.transaction() as conn:
+            if conn.execute("SELECT value FROM meta WHERE name = 'profiles_imported'").fetchone():
+                return 0
+            profiles = load_profiles()
+            updates = [
+                (key, entry)
+                for key, profile in profiles.items()
+                # Embedded history is newest first; insert oldest first so ids keep that order.
+                for entry in reversed(profile.get("history", []))
+            ]
+            self.append(updates, conn)
+            conn.execute("INSERT INTO meta (name, value) VALUES ('profiles_imported', ?)", (str(len(updates)),))
+        return len(updates)
+
+
+class JsonProgressStore:
+    """Every profile in one JSON document; simple, but each save rewrites all of it."""
+
+    def __init__(self, path=PROGRESS_FILE, cache_size=PROFILE_CACHE_SIZE, history_path=None):
+        self.path = Path(path)
+        self.cache = ProfileCache(cache_size) if cache_size > 0 else None
+        ensure_progress_store(self.path)
+        self.history = SessionHistory(history_path or self.path.with_name(HISTORY_DB_NAME))
+        self.history.import_profiles(lambda: load_progress_store(self.path, strict=True).get("profiles", {}))
+
+    def file_signature(self):
+        # Writes from other processes change mtime or size, which drops our cached copies.
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @instrumented("store.get_profile")
+    def get_profile(self, key):
+        if self.cache is None:
+            return load_progress_store(self.path).get("profiles", {}).get(key)
+        signature = self.file_signature()
+        profile = self.cache.get(signature, key)
+        if profile is ProfileCache.MISSING:
+            profile = load_progress_store(self.path).get("profiles", {}).get(key)
+            self.cache.put(signature, key, profile)
+        return profile
+
+    @contextmanager
+    def transaction(self, cache_keys=()):
+        # Load, modify and save under an exclusive lock shared with other processes.
+        # The store is only written back if the block finishes without raising.
+        # The profiles in `cache_keys` are then cached under the new file signature,
+        # while the lock still keeps other writers from changing the file under it.
+        with file_lock(lock_path_for(self.path)):
+            store = load_progress_store(self.path, strict=True)
+            yield store
+            save_progress_store(store, self.path)
+            if self.cache is not None:
+                self.cache.invalidate()
+                signature = self.file_signature()
+                profiles = store.get("profiles", {})
+                for key in cache_keys:
+                    self.cache.put(signature, key, profiles.get(key))
+
+    @instrumented("store.record_session")
+    def record_session(self, key, display_name, entry):
+        return self.record_sessions([(key, display_name, entry)])[key]
+
+    def history_page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        return self.history.page(key, limit, cursor, start, end)
+
+    def get_profiles(self, keys):
+        profiles = load_progress_store(self.path).get("profiles", {})
+        return {key: profiles.get(key) for key in keys}
+
+    def profile_items(self):
+        return list(load_progress_store(self.path).get("profiles", {}).items())
+
+    def replace_stats(self, updates):
+        # {key: counters} from a recomputation; display names and history are kept.
+        with self.transaction() as store:
+            profiles = store.setdefault("profiles", {})
+            for key, counters in updates.items():
+                profiles.setdefault(key, new_profile(key)).update(counters)
+
+    @instrumented("store.record_sessions")
+    def record_sessions(self, updates):
+        # Any number of sessions for one load and one save of the whole file.
+        with self.transaction(cache_keys=[key for key, _, _ in updates]) as store:
+            profiles = store.setdefault("profiles", {})
+            changed = {}
+            for key, display_name, entry in updates:
+                profile = profiles.setdefault(key, new_profile(display_name))
+                profile["display_name"] = display_name
+                apply_session(profile, entry)
+                changed[key] = profile
+            # History first: if the save below fails and the batch is retried, the
+            # repeated sessions are ignored by their ids.
+            self.history.append([(key, entry) for key, _, entry in updates])
+        return changed
+
+
+class SqliteProgressStore:
+    """One row per profile plus the session history table, so a save only touches one user."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            key TEXT PRIMARY KEY,
+            display_name TEXT NOT NULL,
+            total_sessions INTEGER NOT NULL DEFAULT 0,
+            last_session_date TEXT,
+            streak INTEGER NOT NULL DEFAULT 0,
+            best_streak INTEGER NOT NULL DEFAULT 0,
+            theme_counts TEXT NOT NULL DEFAULT '{}',
+            stats TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_key TEXT NOT NULL,
+            date TEXT NOT NULL,
+            entry TEXT NOT NULL,
+            session_id TEXT
+        );
+        CREATE INDEX IF NOT EXISTS history_profile ON history (profile_key, id);
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path=PROGRESS_DB, legacy_json=PROGRESS_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self.transaction() as conn:
+            run_schema(conn, self.SCHEMA)
+            if "stats" not in [row[1] for row in conn.execute("PRAGMA table_info(profiles)")]:
+                conn.execute("ALTER TABLE profiles ADD COLUMN stats TEXT NOT NULL DEFAULT '{}'")
+        # History shares this database file, so a save stays one transaction.
+        self.history = SessionHistory(self.path)
+        if legacy_json is not None:
+            self.migrate_from_json(legacy_json)
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so the read-modify-write
+        # in record_session can't interleave with another writer.
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @instrumented("store.get_profile")
+    def get_profile(self, key):
+        return self._read_profile(self.connect(), key)
+
+    def _read_profile(self, conn, key):
+        count("disk_reads")
+        row = conn.execute(
+            "SELECT display_name, total_sessions, last_session_date, streak, best_streak, theme_counts, stats "
+            "FROM profiles WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "display_name": row[0],
+            "total_sessions": row[1],
+            "last_session_date": row[2],
+            "streak": row[3],
+            "best_streak": row[4],
+            "theme_counts": json.loads(row[5]),
+            "stats": json.loads(row[6]),
+            "history": self.history.recent(key, conn=conn),
+        }
+
+    def _write_profile(self, conn, key, profile):
+        count("disk_writes")
+        conn.execute(
+            "INSERT INTO profiles (key, display_name, total_sessions, last_session_date, streak, best_streak, theme_counts, stats) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET display_name = excluded.display_name, "
+            "total_sessions = excluded.total_sessions, last_session_date = excluded.last_session_date, "
+            "streak = excluded.streak, best_streak = excluded.best_streak, theme_counts = excluded.theme_counts, "
+            "stats = excluded.stats",
+            (
+                key,
+                profile["display_name"],
+                profile["total_sessions"],
+                profile["last_session_date"],
+                profile["streak"],
+                profile["best_streak"],
+                json.dumps(profile["theme_counts"]),
+                json.dumps(profile.get("stats", {})),
+            ),
+        )
+
+    @instrumented("store.record_session")
+    def record_session(self, key, display_name, entry):
+        return self.record_sessions([(key, display_name, entry)])[key]
+
+    def history_page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        return self.history.page(key, limit, cursor, start, end)
+
+    def get_profiles(self, keys):
+        conn = self.connect()
+        return {key: self._read_profile(conn, key) for key in keys}
+
+    def profile_items(self):
+        conn = self.connect()
+        keys = [row[0] for row in conn.execute("SELECT key FROM profiles ORDER BY key")]
+        return [(key, self._read_profile(conn, key)) for key in keys]
+
+    def replace_stats(self, updates):
+        with self.transaction() as conn:
+            for key, counters in updates.items():
+                profile = self._read_profile(conn, key) or new_profile(key)
+                profile.update(counters)
+                self._write_profile(conn, key, profile)
+
+    @instrumented("store.record_sessions")
+    def record_sessions(self, updates):
+        # One transaction for the batch; each profile is read and written once.
+        changed = {}
+        with self.transaction() as conn:
+            for key, display_name, entry in updates:
+                if key not in changed:
+                    changed[key] = self._read_profile(conn, key) or new_profile(display_name)
+                profile = changed[key]
+                profile["display_name"] = display_name
+                apply_session(profile, entry)
+            self.history.append([(key, entry) for key, _, entry in updates], conn)
+            for key, profile in changed.items():
+                self._write_profile(conn, key, profile)
+        return changed
+
+    def migrate_from_json(self, json_path=PROGRESS_FILE):
+        json_path = Path(json_path)
+        done_query = "SELECT value FROM meta WHERE name = 'json_migrated'"
+        # Checked before the JSON is parsed, so starts after the migration don't pay
+        # for reading every profile, or fail on a legacy file damaged since then.
+        if not json_path.exists() or self.connect().execute(done_query).fetchone():
+            return 0
+        profiles = load_progress_store(json_path, strict=True).get("profiles", {})
+        with self.transaction() as conn:
+            if conn.execute(done_query).fetchone():
+                return 0
+            for key, profile in profiles.items():
+                self._write_profile(conn, key, {**new_profile(key), **profile})
+                # JSON history is newest first; insert oldest first so ids keep that order.
+                self.history.append([(key, entry) for entry in reversed(profile.get("history", []))], conn)
+            conn.execute(
+                "INSERT INTO meta (name, value) VALUES ('json_migrated', ?)",
+                (str(json_path),),
+            )
+        return len(profiles)
+
+
+class EventLogProgressStore:
+    """Appends one JSON line per finished session and folds the log into a snapshot now and then."""
+
+    def __init__(self, directory=EVENT_LOG_DIR, compact_every=COMPACT_EVERY, legacy_json=PROGRESS_FILE, history_path=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.directory / "snapshot.json"
+        self.lock_path = self.directory / "store.lock"
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._profiles = {}
+        self._generation = 0
+        self._snapshot_signature = None
+        self._offset = 0
+        self._pending = 0
+        self._compacting = False
+        if legacy_json is not None:
+            self.migrate_from_json(legacy_json)
+        self.history = SessionHistory(history_path or self.directory / HISTORY_DB_NAME)
+        self.history.import_profiles(self._current_profiles)
+
+    def _current_profiles(self):
+        with self._lock:
+            self._refresh()
+            return self._profiles
+
+    def log_path(self, generation):
+        return self.directory / f"events-{generation:08d}.jsonl"
+
+    def _signature(self):
+        try:
+            stat = self.snapshot_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _apply(self, event):
+        # Profiles are replaced, never changed in place, so compact() can write out a
+        # shallow copy of the dict without holding the lock.
+        key = event["key"]
+        current = self._profiles.get(key)
+        if "stats" in event:
+            profile = copy.deepcopy(current) if current is not None else new_profile(key)
+            profile.update(event["stats"])
+        else:
+            profile = copy.deepcopy(current) if current is not None else new_profile(event["display_name"])
+            profile["display_name"] = event["display_name"]
+            apply_session(profile, event["entry"])
+        self._profiles[key] = profile
+
+    def _refresh(self, repair=False):
+        # Bring the in-memory view up to date: reload the snapshot if a compaction
+        # replaced it, then replay only the log lines we haven't seen yet.
+        signature = self._signature()
+        if signature != self._snapshot_signature:
+            snapshot = load_progress_store(self.snapshot_path, strict=True)
+            self._profiles = snapshot.get("profiles", {})
+            self._generation = snapshot.get("generation", 0)
+            self._snapshot_signature = signature
+            self._offset = 0
+            self._pending = 0
+        log_path = self.log_path(self._generation)
+        count("disk_reads")
+        try:
+            with open(log_path, "rb") as handle:
+                handle.seek(self._offset)
+                data = handle.read()
+        except FileNotFoundError:
+            return
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._pending += 1
+        self._offset += complete
+        if repair and complete < len(data):
+            # Only a writer that crashed mid-append leaves a partial line behind.
+            with open(log_path, "r+b") as handle:
+                handle.truncate(self._offset)
+
+    @instrumented("store.get_profile")
+    def get_profile(self, key):
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._profiles.get(key))
+
+    @instrumented("store.record_session")
+    def record_session(self, key, display_name, entry):
+        return self.record_sessions([(key, display_name, entry)])[key]
+
+    def history_page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        return self.history.page(key, limit, cursor, start, end)
+
+    def get_profiles(self, keys):
+        with self._lock:
+            self._refresh()
+            return {key: copy.deepcopy(self._profiles.get(key)) for key in keys}
+
+    def profile_items(self):
+        with self._lock:
+            self._refresh()
+            return list(copy.deepcopy(self._profiles).items())
+
+    def replace_stats(self, updates):
+        # Logged like sessions, so other processes replay the correction too.
+        events = [{"key": key, "stats": counters} for key, counters in updates.items()]
+        data = "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+        with self._lock, file_lock(self.lock_path):
+            self._refresh(repair=True)
+            count("disk_writes")
+            with open(self.log_path(self._generation), "ab") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._offset += len(data)
+            for event in events:
+                self._apply(event)
+            self._pending += len(events)
+
+    @instrumented("store.record_sessions")
+    def record_sessions(self, updates):
+        # The whole batch goes out in one append and one fsync.
+        events = [{"key": key, "display_name": display_name, "entry": entry} for key, display_name, entry in updates]
+        data = "".join(json.dumps(event) + "\n" for event in events).encode("utf-8")
+        with self._lock, file_lock(self.lock_path):
+            self._refresh(repair=True)
+            # History first, so a retried batch can't leave sessions out of it.
+            self.history.append([(event["key"], event["entry"]) for event in events])
+            count("disk_writes")
+            with open(self.log_path(self._generation), "ab") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._offset += len(data)
+            for event in events:
+                self._apply(event)
+            self._pending += len(events)
+            changed = {event["key"]: copy.deepcopy(self._profiles[event["key"]]) for event in events}
+            if self.compact_every and self._pending >= self.compact_every and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self._compact_in_background, daemon=True).start()
+        return changed
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        # Only capturing the state and swapping the files in take the locks; the
+        # snapshot itself is serialized and fsynced while saves carry on.
+        with self._lock, file_lock(self.lock_path):
+            self._refresh(repair=True)
+            generation, offset = self._generation, self._offset
+            profiles = dict(self._profiles)
+        count("disk_writes")
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, prefix=".snapshot.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump({"generation": generation + 1, "profiles": profiles}, handle, indent=2)
+                handle.flush()
+                os.fsync(handle.fileno())
+            with self._lock, file_lock(self.lock_path):
+                self._refresh(repair=True)
+                if self._generation != generation:
+                    return  # another process compacted in the meantime
+                old_log = self.log_path(generation)
+                try:
+                    with open(old_log, "rb") as handle:
+                        handle.seek(offset)
+                        tail = handle.read()
+                except FileNotFoundError:
+                    tail = b""
+                # Sessions saved while the snapshot was written start the new log. It is
+                # in place before the snapshot, and the old log only goes after it, so a
+                # crash at any point leaves a consistent snapshot and log pair.
+                with open(self.log_path(generation + 1), "wb") as handle:
+                    handle.write(tail)
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                os.replace(temp_name, self.snapshot_path)
+                old_log.unlink(missing_ok=True)
+                self._generation = generation + 1
+                self._snapshot_signature = self._signature()
+                self._offset = len(tail)
+                self._pending = tail.count(b"\n")
+        finally:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+
+    def migrate_from_json(self, json_path=PROGRESS_FILE):
+        json_path = Path(json_path)
+        with self._lock, file_lock(self.lock_path):
+            if self.snapshot_path.exists() or not json_path.exists():
+                return 0
+            profiles = load_progress_store(json_path, strict=True).get("profiles", {})
+            save_progress_store({"generation": 0, "profiles": profiles}, self.snapshot_path)
+        return len(profiles)
+
+
+
+class ShardedSessionHistory:
+    """Routes each profile's history to the SessionHistory of its shard."""
+
+    def __init__(self, histories):
+        self.histories = histories
+
+    def __reduce__(self):
+        return (ShardedSessionHistory, (self.histories,))
+
+    def for_key(self, key):
+        return self.histories[shard_for(key, len(self.histories))]
+
+    def append(self, updates):
+        groups = {}
+        for key, entry in updates:
+            groups.setdefault(shard_for(key, len(self.histories)), []).append((key, entry))
+        for shard, group in groups.items():
+            self.histories[shard].append(group)
+
+    def recent(self, key, limit=HISTORY_LIMIT):
+        return self.for_key(key).recent(key, limit)
+
+    def page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        return self.for_key(key).page(key, limit, cursor, start, end)
+
+    def count_sessions(self, key, start=None, end=None):
+        return self.for_key(key).count_sessions(key, start, end)
+
+    def profile_keys(self):
+        return sorted(key for history in self.histories for key in history.profile_keys())
+
+    def sessions(self, key):
+        return self.for_key(key).sessions(key)
+
+
+class ShardedProgressStore:
+    """Profiles spread over PROGRESS_SHARDS JSON files by a hash of their key.
+
+    Each shard is a JsonProgressStore with its own lock, cache and history file, so
+    a save reads and rewrites one small file and concurrent saves for different
+    profiles mostly take different locks. The shard count is fixed when the
+    directory is created; use `migrate-keys` into a new directory to change it.
+    """
+
+    def __init__(self, directory=SHARD_DIR, shards=PROGRESS_SHARDS, cache_size=PROFILE_CACHE_SIZE, legacy_json=PROGRESS_FILE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        layout_path = self.directory / "layout.json"
+        # Held until the layout is fully set up, so processes starting together wait
+        # for the first one instead of racing it through the import below.
+        with file_lock(lock_path_for(layout_path)):
+            if not layout_path.exists():
+                atomic_write_text(layout_path, json.dumps({"shards": shards, "legacy_imported": False}))
+            layout = json.loads(layout_path.read_text(encoding="utf-8"))
+            if layout["shards"] != shards:
+                raise ProgressStoreError(
+                    f"{self.directory} holds {layout['shards']} shards, not PROGRESS_SHARDS={shards}; "
+                    "migrate into a new PROGRESS_SHARD_DIR to change the count."
+                )
+            shard_cache = max(cache_size // shards, 1) if cache_size > 0 else 0
+            self.shards = [
+                JsonProgressStore(
+                    self.directory / f"shard-{index:03d}.json",
+                    cache_size=shard_cache,
+                    history_path=self.directory / f"shard-{index:03d}.history.db",
+                )
+                for index in range(shards)
+            ]
+            self.history = ShardedSessionHistory([shard.history for shard in self.shards])
+            if not layout.get("legacy_imported", True):
+                # A new layout starts on profile ids straight away. The flag is only
+                # set once the import finished; a rerun skips what was already copied.
+                if legacy_json is not None and Path(legacy_json).exists():
+                    migrate_keys(JsonProgressStore(legacy_json), self)
+                atomic_write_text(layout_path, json.dumps({**layout, "legacy_imported": True}))
+
+    def shard(self, key):
+        return self.shards[shard_for(key, len(self.shards))]
+
+    def group(self, keys):
+        groups = {}
+        for key in keys:
+            groups.setdefault(shard_for(key, len(self.shards)), []).append(key)
+        return groups
+
+    @instrumented("store.get_profile")
+    def get_profile(self, key):
+        return self.shard(key).get_profile(key)
+
+    @instrumented("store.record_session")
+    def record_session(self, key, display_name, entry):
+        return self.record_sessions([(key, display_name, entry)])[key]
+
+    def history_page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        return self.history.page(key, limit, cursor, start, end)
+
+    def get_profiles(self, keys):
+        profiles = {}
+        for shard, group in self.group(keys).items():
+            profiles.update(self.shards[shard].get_profiles(group))
+        return profiles
+
+    def profile_items(self):
+        return [item for shard in self.shards for item in shard.profile_items()]
+
+    def replace_stats(self, updates):
+        for shard, group in self.group(updates).items():
+            self.shards[shard].replace_stats({key: updates[key] for key in group})
+
+    @instrumented("store.record_sessions")
+    def record_sessions(self, updates):
+        # One transaction per shard touched, in batch order within each shard.
+        groups = {}
+        for update in updates:
+            groups.setdefault(shard_for(update[0], len(self.shards)), []).append(update)
+        changed = {}
+        for shard, group in groups.items():
+            changed.update(self.shards[shard].record_sessions(group))
+        return changed
+
+
+_redis_clients = {}
+_redis_lock = threading.Lock()
+
+
+def redis_client(url=REDIS_URL):
+    # One connection pool per URL and process; redis is only imported when used.
+    with _redis_lock:
+        client = _redis_clients.get(url)
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(
+                url,
+                decode_responses=True,
+                socket_timeout=5,
+                socket_connect_timeout=5,
+                health_check_interval=30,
+            )
+            _redis_clients[url] = client
+        return client
+
+
+# Sessions on one day are ordered by a per-profile counter scaled into the fraction
+# of the score; a profile would need this many sessions before it reached the next day.
+HISTORY_SEQ_SCALE = 10**7
+
+
+def history_score(entry, seq):
+    # Day number plus the profile's save counter, so a sorted set orders sessions by
+    # date and, within a day, by save order, whatever each replica's clock or time zone.
+    return date.fromisoformat(entry["date"]).toordinal() + seq / HISTORY_SEQ_SCALE
+
+
+class RedisSessionHistory:
+    """Session history in one Redis sorted set per profile, scored by history_score().
+
+    Members are the entries' JSON, so appending a retried session again is a no-op.
+    """
+
+    def __init__(self, url=REDIS_URL, prefix=REDIS_PREFIX):
+        self.url = url
+        self.prefix = prefix
+        self.client = redis_client(url)
+
+    def __reduce__(self):
+        return (RedisSessionHistory, (self.url, self.prefix))
+
+    def key(self, key):
+        return f"{self.prefix}:history:{key}"
+
+    def reserve(self, updates):
+        # The first of a block of counter values per profile. INCRBY has no reply
+        # inside MULTI, so this runs before the transaction; a retried save only
+        # leaves a gap in the numbers.
+        sizes = Counter(key for key, _ in updates)
+        pipe = self.client.pipeline(transaction=False)
+        for key, size in sizes.items():
+            pipe.incrby(f"{self.prefix}:history_seq:{key}", size)
+        return {key: last - sizes[key] + 1 for key, last in zip(sizes, pipe.execute())}
+
+    def append(self, updates, pipe=None):
+        """Store (key, entry) pairs; pass `pipe` to queue them in an open transaction."""
+        target = pipe if pipe is not None else self.client.pipeline()
+        seqs = self.reserve(updates)
+        for key, entry in updates:
+            member = json.dumps(entry, sort_keys=True)
+            target.zadd(self.key(key), {member: history_score(entry, seqs[key])}, nx=True)
+            seqs[key] += 1
+        if pipe is None:
+            count("disk_writes")
+            target.execute()
+
+    @staticmethod
+    def bounds(start=None, end=None):
+        low = date.fromisoformat(str(start)).toordinal() if start else "-inf"
+        high = f"({date.fromisoformat(str(end)).toordinal() + 1}" if end else "+inf"
+        return low, high
+
+    def recent(self, key, limit=HISTORY_LIMIT):
+        count("disk_reads")
+        return [json.loads(member) for member in self.client.zrevrangebyscore(self.key(key), "+inf", "-inf", 0, limit)]
+
+    @instrumented("store.history")
+    def page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        """Same contract as SessionHistory.page()."""
+        low, high = self.bounds(start, end)
+        skip = 0
+        if cursor:
+            # "score:n": continue from `score`, past the n sessions already shown with it.
+            cursor_score, skip = cursor.rsplit(":", 1)
+            high, skip = cursor_score, int(skip)
+        count("disk_reads")
+        rows = self.client.zrevrangebyscore(self.key(key), high, low, skip, limit + 1, withscores=True)
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1][1]
+            shown = sum(1 for _, score in rows[:limit] if score == last)
+            if cursor and float(cursor_score) == last:
+                shown += skip
+            next_cursor = f"{last!r}:{shown}"
+        return [json.loads(member) for member, _ in rows[:limit]], next_cursor
+
+    def count_sessions(self, key, start=None, end=None):
+        count("disk_reads")
+        low, high = self.bounds(start, end)
+        return self.client.zcount(self.key(key), low, high)
+
+    def profile_keys(self):
+        count("disk_reads")
+        return sorted(self.client.smembers(f"{self.prefix}:profiles"))
+
+    def sessions(self, key):
+        count("disk_reads")
+        return [json.loads(member) for member in self.client.zrangebyscore(self.key(key), "-inf", "+inf")]
+
+
+class RedisProgressStore:
+    """Profiles in Redis, so every app replica reads and writes the same progress.
+
+    Each profile is one JSON string. Saves are optimistic WATCH/MULTI transactions,
+    retried if another replica changed one of the same profiles in between.
+    """
+
+    def __init__(self, url=REDIS_URL, prefix=REDIS_PREFIX):
+        self.prefix = prefix
+        self.client = redis_client(url)
+        self.history = RedisSessionHistory(url, prefix)
+
+    def key(self, key):
+        return f"{self.prefix}:profile:{key}"
+
+    @instrumented("store.get_profile")
+    def get_profile(self, key):
+        count("disk_reads")
+        raw = self.client.get(self.key(key))
+        return json.loads(raw) if raw else None
+
+    @instrumented("store.record_session")
+    def record_session(self, key, display_name, entry):
+        return self.record_sessions([(key, display_name, entry)])[key]
+
+    def history_page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        return self.history.page(key, limit, cursor, start, end)
+
+    def get_profiles(self, keys):
+        count("disk_reads")
+        raws = self.client.mget([self.key(key) for key in keys]) if keys else []
+        return {key: json.loads(raw) if raw else None for key, raw in zip(keys, raws)}
+
+    def profile_items(self):
+        keys = self.history.profile_keys()
+        return list(self.get_profiles(keys).items())
+
+    def _update(self, keys, change):
+        # Read the profiles under WATCH, let `change(profiles, pipe)` modify them and
+        # queue any extra commands, then write everything in one MULTI/EXEC.
+        import redis
+
+        keys = list(dict.fromkeys(keys))
+        names = [self.key(key) for key in keys]
+        try:
+            with self.client.pipeline() as pipe:
+                for _ in range(REDIS_MAX_RETRIES):
+                    try:
+                        pipe.watch(*names)
+                        count("disk_reads")
+                        raws = pipe.mget(names)
+                        profiles = {key: json.loads(raw) if raw else None for key, raw in zip(keys, raws)}
+                        pipe.multi()
+                        change(profiles, pipe)
+                        for key, profile in profiles.items():
+                            pipe.set(self.key(key), json.dumps(profile))
+                        pipe.sadd(f"{self.prefix}:profiles", *keys)
+                        count("disk_writes")
+                        pipe.execute()
+                        return profiles
+                    except redis.WatchError:
+                        count("store_conflicts")
+        except redis.RedisError as exc:
+            raise ProgressStoreError(f"Redis progress store unavailable: {exc}") from exc
+        raise ProgressStoreError(f"Gave up saving after {REDIS_MAX_RETRIES} conflicting writes.")
+
+    def replace_stats(self, updates):
+        def change(profiles, pipe):
+            for key, counters in updates.items():
+                profiles[key] = profiles[key] or new_profile(key)
+                profiles[key].update(counters)
+
+        self._update(list(updates), change)
+
+    @instrumented("store.record_sessions")
+    def record_sessions(self, updates):
+        def change(profiles, pipe):
+            for key, display_name, entry in updates:
+                profile = profiles[key] = profiles[key] or new_profile(display_name)
+                profile["display_name"] = display_name
+                apply_session(profile, entry)
+            # Same transaction as the profiles, so history and counters never disagree.
+            self.history.append([(key, entry) for key, _, entry in updates], pipe)
+
+        return self._update([key for key, _, _ in updates], change)
+
+
+class WriteBehindProgressStore:
+    """Queues finished sessions in memory and writes them to a backend in batches.
+
+    Reads go to the backend with this process's queued sessions applied on top, so
+    a user sees their own save straight away. Other processes see it once the batch
+    is flushed. Whatever is still queued is flushed when the process exits.
+    """
+
+    def __init__(self, backend, flush_ms=FLUSH_MS, flush_events=FLUSH_EVENTS):
+        self.backend = backend
+        self.interval = flush_ms / 1000
+        self.flush_events = max(1, flush_events)
+        self.batches = 0
+        self.flushed = 0
+        self.last_error = None
+        self._queue = []
+        # The batch being written, and a version bumped whenever sessions move from
+        # the queue to a write or from a write to the backend; reads use it to tell
+        # whether the backend changed under them.
+        self._writing = []
+        self._version = 0
+        self._cond = threading.Condition()
+        # Only one batch is written at a time.
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="progress-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _read_with_queue(self, key, read):
+        # Returns read() from the backend and this key's queued sessions. Reads don't
+        # wait for flushes. A read is retried if a batch started or finished while it
+        # ran, so a session is never counted both in the backend and in the queue.
+        # Only a key whose own sessions are being written waits, because the backend
+        # may or may not hold them yet.
+        while True:
+            with self._cond:
+                if any(update[0] == key for update in self._writing):
+                    version = self._version
+                    self._cond.wait_for(lambda: self._version != version)
+                    continue
+                version = self._version
+                queued = [update for update in self._queue if update[0] == key]
+            result = read()
+            with self._cond:
+                if self._version == version:
+                    return result, queued
+
+    @instrumented("store.get_profile")
+    def get_profile(self, key):
+        profile, queued = self._read_with_queue(key, lambda: self.backend.get_profile(key))
+        if not queued:
+            return profile
+        profile = copy.deepcopy(profile)
+        for _, display_name, entry in queued:
+            if profile is None:
+                profile = new_profile(display_name)
+            profile["display_name"] = display_name
+            apply_session(profile, entry)
+        return profile
+
+    @instrumented("store.record_session")
+    def record_session(self, key, display_name, entry):
+        with self._cond:
+            if self._closed:
+                raise ProgressStoreError("The progress store has been shut down.")
+            self._queue.append((key, display_name, copy.deepcopy(entry)))
+            if len(self._queue) >= self.flush_events:
+                self._cond.notify_all()
+
+    def history_page(self, key, limit=HISTORY_PAGE_SIZE, cursor=None, start=None, end=None):
+        if cursor is not None:
+            return self.backend.history_page(key, limit, cursor, start, end)
+        # This process's queued sessions are the newest, so they go on top of the
+        # first page; later pages carry on from the backend's cursor.
+        (entries, next_cursor), queued = self._read_with_queue(
+            key, lambda: self.backend.history_page(key, limit, None, start, end)
+        )
+        fresh = [
+            entry
+            for _, _, entry in reversed(queued)
+            if (not start or entry["date"] >= str(start)) and (not end or entry["date"] <= str(end))
+        ]
+        if fresh:
+            entries = sorted(fresh + entries, key=lambda entry: entry["date"], reverse=True)
+        return entries, next_cursor
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                batch, self._queue = self._queue, []
+                if not batch:
+                    return 0
+                self._writing = batch
+                self._version += 1
+            try:
+                self.backend.record_sessions(batch)
+            except BaseException:
+                with self._cond:
+                    self._queue[:0] = batch
+                    self._finish_write()
+                raise
+            with self._cond:
+                self._finish_write()
+            self.batches += 1
+            self.flushed += len(batch)
+        count("flushed_sessions", len(batch))
+        return len(batch)
+
+    def _finish_write(self):
+        self._writing = []
+        self._version += 1
+        self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed)
+                # The batch window opens with the first queued session.
+                self._cond.wait_for(
+                    lambda: len(self._queue) >= self.flush_events or self._closed,
+                    timeout=self.interval,
+                )
+                if self._closed:
+                    return
+            try:
+                self.flush()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = exc
+                logger.warning("Progress flush failed, retrying in %.0f ms: %s", self.interval * 1000, exc)
+                time.sleep(self.interval)
+
+    def close(self):
+        # Stop the background flusher, then write out whatever is left from this thread.
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+
+BACKENDS = {
+    "json": JsonProgressStore,
+    "sqlite": SqliteProgressStore,
+    "eventlog": EventLogProgressStore,
+    "redis": RedisProgressStore,
+    "sharded": ShardedProgressStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_progress_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.getenv("PROGRESS_BACKEND", "json").lower()
+                if backend not in BACKENDS:
+                    raise ValueError(f"Unknown PROGRESS_BACKEND '{backend}'. Choose from: {', '.join(BACKENDS)}")
+                _store = BACKENDS[backend]()
+                if WRITE_BEHIND:
+                    _store = WriteBehindProgressStore(_store)
+    return _store
+
+
+def recompute_profiles(history, keys):
+    # Runs in a worker process: rebuild the counters of `keys` from their full history.
+    results = []
+    for key in keys:
+        entries = history.sessions(key)
+        results.append((key, len(entries), recompute_stats(entries)))
+    return results
+
+
+def backfill_stats(store, workers=None, chunk_size=200, fix=False):
+    """Recompute every profile's counters from history, in parallel, and compare.
+
+    Profiles whose history holds fewer sessions than their total (sessions saved
+    before full history was kept) are reported but never overwritten. With `fix`,
+    mismatched counters are replaced and the result is checked again.
+    """
+    started = time.perf_counter()
+    keys = store.history.profile_keys()
+    chunks = [keys[index : index + chunk_size] for index in range(0, len(keys), chunk_size)]
+    report = {"profiles": len(keys), "sessions": 0, "consistent": 0, "fixed": 0, "incomplete": [], "mismatched": {}}
+    fixes = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(recompute_profiles, [store.history] * len(chunks), chunks):
+            stored = store.get_profiles([key for key, _, _ in results])
+            for key, sessions, expected in results:
+                report["sessions"] += sessions
+                profile = stored[key] or new_profile(key)
+                if profile["total_sessions"] > sessions:
+                    report["incomplete"].append(key)
+                    continue
+                fields = stats_mismatch(profile, expected)
+                if not fields:
+                    report["consistent"] += 1
+                    continue
+                report["mismatched"][key] = fields
+                fixes[key] = {field: expected[field] for field in STAT_FIELDS}
+    if fix and fixes:
+        items = list(fixes.items())
+        for index in range(0, len(items), chunk_size):
+            store.replace_stats(dict(items[index : index + chunk_size]))
+        stored = store.get_profiles(list(fixes))
+        still_wrong = [key for key, counters in fixes.items() if stats_mismatch(stored[key], counters)]
+        report["fixed"] = len(fixes) - len(still_wrong)
+        report["mismatched"] = {key: report["mismatched"][key] for key in still_wrong}
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def copied_sessions(key, sessions):
+    # History skips a repeated session by its id, but sessions saved before ids
+    # existed have none. Give those one derived from where they are copied from,
+    # so copying the same history again adds nothing.
+    copied = []
+    for position, entry in enumerate(sessions):
+        if not entry.get("id"):
+            source = f"{key}\n{position}\n{json.dumps(entry, sort_keys=True)}"
+            entry = {**entry, "id": "legacy-" + hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]}
+        copied.append(entry)
+    return copied
+
+
+def migrate_keys(source, target, rename=True, chunk_size=200):
+    """Copy every profile and its history from `source` into `target`.
+
+    With `rename`, profiles stored under a legacy key (the lower-cased name) move
+    to profile_id() of that key. The old shared "guest" profile mixes every
+    anonymous visitor, so it is not renamed to anyone's id and stays where it is.
+    Profiles whose key already exists in `target` are left alone, so the copy can
+    be rerun safely; `source` is never modified.
+    """
+    report = {"profiles": 0, "sessions": 0, "skipped": 0, "guest": 0}
+    items = source.profile_items()
+    if rename:
+        report["guest"] = sum(1 for key, _ in items if key == LEGACY_GUEST_KEY)
+        items = [(key, profile) for key, profile in items if key != LEGACY_GUEST_KEY]
+    for index in range(0, len(items), chunk_size):
+        chunk = [
+            (key, profile_id(key) if rename and not is_profile_id(key) else key, profile)
+            for key, profile in items[index : index + chunk_size]
+        ]
+        existing = target.get_profiles([new_key for _, new_key, _ in chunk])
+        profiles = {}
+        for key, new_key, profile in chunk:
+            if existing[new_key] is not None or new_key in profiles:
+                report["skipped"] += 1
+                continue
+            # History first, like a save: a rerun after a crash only repeats it.
+            sessions = copied_sessions(key, source.history.sessions(key))
+            target.history.append([(new_key, entry) for entry in sessions])
+            report["sessions"] += len(sessions)
+            profiles[new_key] = {**new_profile(profile.get("display_name") or key), **profile}
+        if profiles:
+            target.replace_stats(profiles)
+            report["profiles"] += len(profiles)
+    return report
+
+
+def legacy_key(name):
+    # How profiles were keyed before profile_id(): the name, stripped and lower-cased.
+    return name.strip().lower()
+
+
+def adopt_legacy_profile(store, name):
+    """Copy the profile saved under `name`'s legacy key to profile_id(name).
+
+    Lets existing users keep their progress without running migrate-keys first.
+    Nothing happens when the profile id already exists or there is no legacy
+    profile, so it is safe to call on every visit. Returns True if it copied one.
+    """
+    store = getattr(store, "backend", store)
+    old_key, new_key = legacy_key(name), profile_id(name)
+    if old_key in ("", LEGACY_GUEST_KEY):
+        return False
+    profiles = store.get_profiles([old_key, new_key])
+    if profiles[new_key] is not None or profiles[old_key] is None:
+        return False
+    # History first, like migrate_keys(); replicas adopting at once add each session once.
+    store.history.append([(new_key, entry) for entry in copied_sessions(old_key, store.history.sessions(old_key))])
+    store.replace_stats({new_key: {**new_profile(name.strip()), **profiles[old_key]}})
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands for the progress store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="Copy user_progress.json into the SQLite backend.")
+    migrate.add_argument("--json", type=Path, default=PROGRESS_FILE)
+    migrate.add_argument("--db", type=Path, default=PROGRESS_DB)
+    compact = commands.add_parser("compact", help="Fold the event log into its snapshot.")
+    compact.add_argument("--dir", type=Path, default=EVENT_LOG_DIR)
+    backfill = commands.add_parser("backfill", help="Recompute streaks and statistics from session history.")
+    backfill.add_argument("--backend", choices=list(BACKENDS), default=os.getenv("PROGRESS_BACKEND", "json").lower())
+    backfill.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    backfill.add_argument("--fix", action="store_true", help="overwrite counters that don't match their history")
+    migrate_keys_cmd = commands.add_parser("migrate-keys", help="Move profiles to hashed profile ids, optionally into another backend.")
+    migrate_keys_cmd.add_argument("--from", dest="source", choices=list(BACKENDS), default=os.getenv("PROGRESS_BACKEND", "json").lower())
+    migrate_keys_cmd.add_argument("--to", dest="target", choices=list(BACKENDS), help="default: the --from backend, in place")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        store = SqliteProgressStore(args.db, legacy_json=None)
+        migrated = store.migrate_from_json(args.json)
+        print(f"Migrated {migrated} profiles from {args.json} into {args.db}.")
+    elif args.command == "compact":
+        EventLogProgressStore(args.dir, legacy_json=None).compact()
+        print(f"Compacted the event log in {args.dir}.")
+    elif args.command == "backfill":
+        report = backfill_stats(BACKENDS[args.backend](), workers=args.workers, fix=args.fix)
+        seconds = report["seconds"]
+        print(
+            f"Recomputed {report['profiles']} profiles ({report['sessions']} sessions) in {seconds:.2f}s: "
+            f"{report['profiles'] / seconds:.0f} profiles/s, {report['sessions'] / seconds:.0f} sessions/s."
+        )
+        print(f"{report['consistent']} consistent, {report['fixed']} fixed, {len(report['mismatched'])} mismatched.")
+        for key, fields in list(report["mismatched"].items())[:10]:
+            print(f"  {key}: {', '.join(fields)}")
+        if report["incomplete"]:
+            print(f"{len(report['incomplete'])} profiles have less history than sessions and were left alone.")
+        if report["mismatched"]:
+            sys.exit(1)
+    elif args.command == "migrate-keys":
+        source = BACKENDS[args.source]()
+        target = BACKENDS[args.target]() if args.target and args.target != args.source else source
+        report = migrate_keys(source, target)
+        print(
+            f"Copied {report['profiles']} profiles ({report['sessions']} sessions) to {args.target or args.source}; "
+            f"{report['skipped']} already there."
+        )
+        if report["guest"]:
+            print('The old shared "guest" profile was left in place; it belongs to no one.')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import os
+import random
+from dataclasses import dataclass
+
+from deck import DrawnCard, get_pack
+from templates import compile_context_templates, new_reading_id, new_reading_ids
+
+
+# A drawn card comes up reversed one time in three.
+REVERSED_PROBABILITY = 1 / 3
+
+
+@dataclass(frozen=True, slots=True)
+class Spread:
+    """A named layout: position labels, which positions the narrative leans on, and
+    where each card sits when the spread is shown (row, column), or None to flow in
+    rows of `columns`."""
+
+    name: str
+    title: str
+    labels: tuple
+    past: int
+    focus: int
+    future: int
+    columns: int
+    grid: tuple = None
+
+    @property
+    def size(self):
+        return len(self.labels)
+
+
+SPREADS = {
+    spread.name: spread
+    for spread in (
+        Spread("single", "Single card", ("Present Focus",), past=0, focus=0, future=0, columns=1),
+        Spread(
+            "three",
+            "Three-card",
+            ("Past Influence", "Present Focus", "Future Potential"),
+            past=0,
+            focus=1,
+            future=2,
+            columns=3,
+        ),
+        Spread(
+            "cross",
+            "Five-card cross",
+            ("Present Focus", "Past Influence", "Future Potential", "Guiding Goal", "Hidden Challenge"),
+            past=1,
+            focus=0,
+            future=2,
+            columns=3,
+            grid=((1, 1), (1, 0), (1, 2), (0, 1), (2, 1)),
+        ),
+        Spread(
+            "celtic",
+            "Celtic cross (10 cards)",
+            (
+                "Present Focus",
+                "Crossing Challenge",
+                "Foundation",
+                "Recent Past",
+                "Best Outcome",
+                "Near Future",
+                "Your Approach",
+                "Work Environment",
+                "Hopes and Fears",
+                "Likely Outcome",
+            ),
+            past=3,
+            focus=0,
+            future=5,
+            columns=5,
+        ),
+    )
+}
+DEFAULT_SPREAD = os.getenv("TAROT_SPREAD", "three")
+
+
+def get_spread(name=None):
+    try:
+        return SPREADS[name or DEFAULT_SPREAD]
+    except KeyError:
+        raise ValueError(f"Unknown spread {name!r}; choose from {', '.join(SPREADS)}") from None
+
+
+def spreads_for_deck(deck_size):
+    return [spread for spread in SPREADS.values() if spread.size <= deck_size]
+
+
+def compose_reading(cards, inputs, pack=None, seed=None, spread=None, dominant_theme=None, reading_id=None, templates=None):
+    """Turn drawn cards and check-in inputs into the reading shown in the app.
+
+    build_readings() passes the dominant theme, id and templates it already
+    worked out for the whole batch.
+    """
+    pack = pack or get_pack()
+    spread = spread or get_spread("three")
+    context = pack.contexts[inputs["context"]]
+    past, focus, future = cards[spread.past], cards[spread.focus], cards[spread.future]
+    if dominant_theme is None:
+        themes = [card.theme for card in cards]
+        # Ties go to the earliest card in the spread, so the result never depends on hash order.
+        dominant_theme = max(themes, key=themes.count)
+
+    narrative, reflection, action_plan = (templates or compile_context_templates(context)).render(
+        {
+            "past": past.title,
+            "focus": focus.title,
+            "future": future.title,
+            "goal": inputs["goal"],
+            "energy": inputs["energy"],
+            "challenge": inputs["challenge"] or "No challenge entered",
+            "dominant_theme": dominant_theme,
+        }
+    )
+
+    return {
+        "id": reading_id or new_reading_id(),
+        "cards": cards,
+        "spread": spread.name,
+        "context": inputs["context"],
+        "dominant_theme": dominant_theme,
+        "narrative": narrative,
+        "reflection": reflection,
+        "action_plan": action_plan,
+        "reflection_questions": context.reflection_questions,
+        "focus_prompt": context.focus_prompt,
+        "seed": seed,
+    }
+
+
+def build_reading(deck_order, seed_index, inputs, seed=None, spread=None, pack=None):
+    """Build one reading from a deck permutation and the picked starting card.
+
+    Pure: no Streamlit state and no global random state. The same arguments and
+    seed always give the same reading. The spread takes the cards that follow the
+    starting card in the permutation, so they are distinct and picking them costs
+    O(spread size) whatever the deck size.
+    """
+    pack = pack or get_pack()
+    spread = spread if isinstance(spread, Spread) else get_spread(spread)
+    if spread.size > len(deck_order):
+        raise ValueError(f"The {spread.title} spread needs {spread.size} cards; the deck has {len(deck_order)}")
+    rng = random.Random(seed)
+    cards = []
+    for offset, label in enumerate(spread.labels):
+        slot = (seed_index + offset) % len(deck_order)
+        cards.append(
+            DrawnCard(
+                index=deck_order[slot],
+                slot=slot,
+                is_reversed=rng.random() < REVERSED_PROBABILITY,
+                position_label=label,
+                deck=pack.cards,
+            )
+        )
+    return compose_reading(cards, inputs, pack, seed, spread)
+
+
+def reading_to_dict(reading):
+    """Plain-JSON form of a reading, for exports and offline runs."""
+    return {
+        "id": reading["id"],
+        "seed": reading["seed"],
+        "spread": reading["spread"],
+        "context": reading["context"],
+        "dominant_theme": reading["dominant_theme"],
+        "cards": [
+            {
+                "position": card.position_label,
+                "title": card.title,
+                "emoji": card.emoji,
+                "reversed": card.is_reversed,
+                "meaning": card.active_meaning,
+            }
+            for card in reading["cards"]
+        ],
+        "narrative": reading["narrative"],
+        "reflection": reading["reflection"],
+        "action_plan": list(reading["action_plan"]),
+        "focus_prompt": reading["focus_prompt"],
+        "reflection_questions": list(reading["reflection_questions"]),
+    }
+
+
+def sample_without_replacement(rng, count, deck_size, spread_size):
+    # Small spreads from big decks: draw spread_size indices per row and redraw the
+    # rare rows with a repeat, O(spread size) per row. Spreads that take a large share
+    # of the deck fall back to ranking a full row of random keys.
+    if spread_size * 2 > deck_size:
+        return rng.random((count, deck_size)).argsort(axis=1)[:, :spread_size]
+    import numpy as np
+
+    picks = rng.integers(0, deck_size, size=(count, spread_size))
+    while True:
+        ordered = np.sort(picks, axis=1)
+        repeats = np.flatnonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))
+        if not repeats.size:
+            return picks
+        picks[repeats] = rng.integers(0, deck_size, size=(repeats.size, spread_size))
+
+
+def draw_batch(count, deck_size, spread_size=3, seed=None, deck_order=None):
+    """Draw `count` spreads at once, without replacement within each spread.
+
+    Each spread comes from its own shuffled deck (or all share `deck_order` if given)
+    starting at a random position. Returns (slots, indices, reversed) as
+    count x spread_size NumPy arrays.
+    """
+    import numpy as np
+
+    if spread_size > deck_size:
+        raise ValueError(f"Cannot draw {spread_size} cards from a {deck_size}-card deck")
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, deck_size, size=count)
+    slots = (starts[:, None] + np.arange(spread_size)) % deck_size
+    if deck_order is None:
+        indices = sample_without_replacement(rng, count, deck_size, spread_size)
+    else:
+        indices = np.asarray(deck_order)[slots]
+    reversed_flags = rng.random((count, spread_size)) < REVERSED_PROBABILITY
+    return slots, indices, reversed_flags
+
+
+def build_readings(inputs, count, seed=None, spread=None, pack=None, deck_order=None):
+    """Generate `count` readings for the same check-in inputs in one call.
+
+    Cards, reversals and each reading's dominant theme are worked out vectorized;
+    only the text is filled in per reading. A seeded batch is reproducible as a
+    whole, but its readings carry seed=None: one can't be rebuilt alone with
+    build_reading(), only by rerunning the batch with the same seed and count.
+    """
+    import numpy as np
+
+    pack = pack or get_pack()
+    spread = spread if isinstance(spread, Spread) else get_spread(spread)
+    deck = pack.cards
+    slots, indices, reversed_flags = draw_batch(count, len(deck), spread.size, seed, deck_order)
+    theme_names = sorted({card.theme for card in deck})
+    theme_codes = np.array([theme_names.index(card.theme) for card in deck])[indices]
+    # How often each card's theme occurs in its spread; argmax takes the first of the
+    # most common, the same tie-break as compose_reading().
+    occurrences = (theme_codes[:, :, None] == theme_codes[:, None, :]).sum(axis=2)
+    dominant = theme_codes[np.arange(count), occurrences.argmax(axis=1)]
+    templates = compile_context_templates(pack.contexts[inputs["context"]])
+    readings = []
+    for row_slots, row_indices, row_reversed, theme, reading_id in zip(
+        slots.tolist(), indices.tolist(), reversed_flags.tolist(), dominant.tolist(), new_reading_ids(count)
+    ):
+        cards = [
+            DrawnCard(index=index, slot=slot, is_reversed=is_reversed, position_label=label, deck=deck)
+            for slot, index, is_reversed, label in zip(row_slots, row_indices, row_reversed, spread.labels)
+        ]
+        readings.append(
+            compose_reading(
+                cards,
+                inputs,
+                pack,
+                spread=spread,
+                dominant_theme=theme_names[theme],
+                reading_id=reading_id,
+                templates=templates,
+            )
+        )
+    return readings
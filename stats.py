@@ -0,0 +1,117 @@
+"""Per-profile statistics, updated in O(1) per session and recomputable from history."""
+
+from datetime import date, timedelta
+
+
+# Bump when a metric is added or its meaning changes; `python progress_store.py backfill`
+# recomputes every profile stored with an older version.
+STATS_VERSION = 2
+ROLLING_DAYS = 30
+
+
+def week_start(day):
+    # Weeks run Monday to Sunday and are named after their Monday.
+    day = date.fromisoformat(day) if isinstance(day, str) else day
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def new_stats():
+    return {
+        "version": STATS_VERSION,
+        "last_week": None,
+        "active_weeks": 0,
+        "week_streak": 0,
+        "best_week_streak": 0,
+        # Sessions per day for the newest ROLLING_DAYS days only.
+        "recent_days": {},
+    }
+
+
+def update_streak(profile, session_day):
+    previous = profile.get("last_session_date")
+    if previous is not None and session_day <= previous:
+        # Same day, or a late-arriving older session: the streak already covers it.
+        return
+    if previous and date.fromisoformat(previous) == date.fromisoformat(session_day) - timedelta(days=1):
+        profile["streak"] += 1
+    else:
+        profile["streak"] = 1
+    profile["best_streak"] = max(profile["best_streak"], profile["streak"])
+    profile["last_session_date"] = session_day
+
+
+def update_weekly(stats, session_day):
+    week = week_start(session_day)
+    previous = stats["last_week"]
+    if previous is not None and week <= previous:
+        return
+    stats["active_weeks"] += 1
+    if previous and date.fromisoformat(previous) == date.fromisoformat(week) - timedelta(weeks=1):
+        stats["week_streak"] += 1
+    else:
+        stats["week_streak"] = 1
+    stats["best_week_streak"] = max(stats["best_week_streak"], stats["week_streak"])
+    stats["last_week"] = week
+
+
+def update_rolling(stats, session_day):
+    days = stats["recent_days"]
+    days[session_day] = days.get(session_day, 0) + 1
+    if len(days) > ROLLING_DAYS:
+        cutoff = (date.fromisoformat(max(days)) - timedelta(days=ROLLING_DAYS - 1)).isoformat()
+        # At most ROLLING_DAYS + 1 keys, so this stays constant-time per session.
+        for day in [day for day in days if day < cutoff]:
+            del days[day]
+
+
+def ensure_stats(profile):
+    # Profiles saved before a metric existed start it from zero, but keep their old
+    # version number so the backfill knows their counters are incomplete.
+    stats = profile.get("stats") or {}
+    if not stats and profile.get("total_sessions"):
+        stats["version"] = 0
+    profile["stats"] = {**new_stats(), **stats}
+    return profile["stats"]
+
+
+def apply_stats(profile, entry):
+    """Fold one session into the profile's counters."""
+    session_day = entry["date"]
+    stats = ensure_stats(profile)
+    profile["total_sessions"] += 1
+    update_streak(profile, session_day)
+    theme = entry["dominant_theme"]
+    profile["theme_counts"][theme] = profile["theme_counts"].get(theme, 0) + 1
+    update_weekly(stats, session_day)
+    update_rolling(stats, session_day)
+    return profile
+
+
+def recompute_stats(entries):
+    """Counters rebuilt from a profile's full session history, in any order."""
+    profile = {
+        "total_sessions": 0,
+        "last_session_date": None,
+        "streak": 0,
+        "best_streak": 0,
+        "theme_counts": {},
+        "stats": new_stats(),
+    }
+    for entry in sorted(entries, key=lambda entry: entry["date"]):
+        apply_stats(profile, entry)
+    return profile
+
+
+STAT_FIELDS = ("total_sessions", "last_session_date", "streak", "best_streak", "theme_counts", "stats")
+
+
+def stats_mismatch(profile, expected):
+    # Names of the counters that differ from a recomputation.
+    return [field for field in STAT_FIELDS if profile.get(field) != expected[field]]
+
+
+def sessions_in_last_days(profile, days=ROLLING_DAYS, today=None):
+    days = min(days, ROLLING_DAYS)
+    cutoff = ((today or date.today()) - timedelta(days=days - 1)).isoformat()
+    recent = profile.get("stats", {}).get("recent_days", {})
+    return sum(sessions for day, sessions in recent.items() if day >= cutoff)
@@ -0,0 +1,135 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from instrumentation import count
+
+
+# Rendered strings kept per reading (share text, coaching prompt, ...).
+MEMO_SIZE = int(os.getenv("TAROT_TEMPLATE_CACHE_SIZE", "2048"))
+
+NARRATIVE = (
+    "For the context of {context_name}, your session starts with {past}, which points to the recent pattern shaping your work mindset. "
+    "{focus} is the center of gravity right now, suggesting the most useful response is to stay focused on what moves your goal forward. "
+    "{future} suggests where momentum can build next if you act with consistency instead of urgency."
+)
+REFLECTION = (
+    "You rated your energy at {energy}/5 and named this challenge: '{challenge}'. "
+    "{intro} The spread leans most strongly toward {dominant_theme}, so the strongest session takeaway is to align your next action with that theme."
+)
+ACTION_PLAN = (
+    "{action_hint} Use {focus} as the lens for your next 48 hours.",
+    "Use the lesson from {past} to avoid repeating an old pattern this week.",
+    "Prepare for {future} by writing down one visible outcome tied to your goal: {goal}.",
+)
+WRAP_UP = "Dominant theme: {theme}. Keep your next move small, visible, and tied to your goal."
+SHARE = (
+    "{session_name} guided tarot session\n"
+    "Context: {context_name}\n"
+    "Goal: {goal}\n"
+    "Challenge: {challenge}\n"
+    "Cards: {cards}\n"
+    "Takeaway: {narrative}\n"
+    "Next move: {next_move}"
+)
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def bake(template, **values):
+    # Fill in the fields known up front and leave the rest as {placeholders}.
+    escaped = {key: str(value).replace("{", "{{").replace("}", "}}") for key, value in values.items()}
+    return template.format_map(_KeepMissing(escaped))
+
+
+@dataclass(frozen=True, slots=True)
+class ContextTemplates:
+    narrative: str
+    reflection: str
+    action_plan: tuple
+
+    def render(self, fields):
+        return (
+            self.narrative.format_map(fields),
+            self.reflection.format_map(fields),
+            [template.format_map(fields) for template in self.action_plan],
+        )
+
+
+@lru_cache(maxsize=256)
+def compile_context_templates(context):
+    """Reading templates with the career context's own text already filled in.
+
+    Compiled once per context (and again only if a pack reload changes it).
+    """
+    values = {"context_name": context.name, "intro": context.intro, "action_hint": context.action_hint}
+    return ContextTemplates(
+        narrative=bake(NARRATIVE, **values),
+        reflection=bake(REFLECTION, **values),
+        action_plan=tuple(bake(template, **values) for template in ACTION_PLAN),
+    )
+
+
+def new_reading_id():
+    return uuid.uuid4().hex
+
+
+def new_reading_ids(count):
+    # Same 32 hex characters as new_reading_id(), from one call to the OS for a whole batch.
+    data = os.urandom(16 * count).hex()
+    return [data[index : index + 32] for index in range(0, len(data), 32)]
+
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def memoized(reading, name, build, *parts):
+    """Return build() for this reading, computed once per reading id and `parts`.
+
+    Steps 3-5 rerun on every widget interaction; this keeps them from rebuilding
+    the same strings each time.
+    """
+    reading_id = reading.get("id")
+    if reading_id is None:
+        return build()
+    key = (reading_id, name, parts)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    value = build()
+    count("template_renders")
+    with _memo_lock:
+        _memo[key] = value
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return value
+
+
+def wrap_up_headline(reading):
+    return memoized(reading, "wrap_up", lambda: WRAP_UP.format(theme=reading["dominant_theme"].title()))
+
+
+def share_text(reading, inputs, next_move):
+    session_name = inputs["name"].strip() or "Your"
+    next_move = next_move.strip()
+
+    def build():
+        return SHARE.format(
+            session_name=session_name,
+            context_name=reading["context"],
+            goal=inputs["goal"],
+            challenge=inputs["challenge"] or "Not provided",
+            cards=", ".join(card.title + (" reversed" if card.is_reversed else "") for card in reading["cards"]),
+            narrative=reading["narrative"],
+            next_move=next_move or reading["action_plan"][0],
+        )
+
+    return memoized(reading, "share", build, session_name, inputs["goal"], inputs["challenge"], next_move)